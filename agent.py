@@ -1,18 +1,69 @@
 import asyncio
-from call_api import LLMCaller
+import os
+from call_api import create_llm_caller
+from file_cache import FileSnapshotCache, FileSnapshot, shared_file_cache
 from pathlib import Path
 import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 from queue import Queue
 from datetime import datetime
 
+# Schema for the action plan returned by Agent.think, used to abort invalid responses mid-stream
+THINK_ACTION_SCHEMA = {
+    "type": "object",
+    "required": ["action"],
+    "properties": {
+        "action": {"type": "string", "enum": ["file_change", "send_message", "analyze"]},
+        "target_file": {"type": "string"},
+        "changes": {
+            "type": "object",
+            "properties": {
+                "replace_all": {"type": "boolean"},
+                "content": {"type": "string"},
+                "patches": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "start": {"type": "integer"},
+                            "end": {"type": "integer"},
+                            "content": {"type": "string"}
+                        }
+                    }
+                }
+            }
+        },
+        "message": {
+            "type": "object",
+            "properties": {
+                "target_agent": {"type": "string"},
+                "content": {"type": "string"}
+            }
+        },
+        "analysis": {
+            "type": "object",
+            "properties": {
+                "files_analyzed": {"type": "array", "items": {"type": "string"}},
+                "findings": {"type": "string"}
+            }
+        }
+    }
+}
+
 class Agent:
-    def __init__(self, name: str, responsible_files: List[str]):
+    def __init__(self, name: str, responsible_files: List[str], file_cache: Optional[FileSnapshotCache] = None):
         self.name = name
         self.responsible_files = responsible_files
-        self.llm_handler = LLMCaller()
+        self.llm_handler = create_llm_caller()
         self.message_queue = asyncio.Queue()
         self.running = True
+
+        # File contents come from the shared snapshot cache; seen_files is what this agent's LLM has been shown
+        self.file_cache = file_cache or shared_file_cache
+        self.seen_files: Dict[str, FileSnapshot] = {}
+        self.changed_files: Set[str] = set()
+        self.last_prompt_chars = 0
+        self.file_cache.subscribe(self.on_file_changed)
         
         # Log creation
         self.log_action("Created", f"Responsible for files: {responsible_files}")
@@ -47,6 +98,12 @@ Details: {details}
         await self.message_queue.put(message_data)
         self.log_action("Message Received", f"From: {message_data['from']}, Content: {message_data['message']}")
 
+    def on_file_changed(self, path: str, snapshot: FileSnapshot):
+        """Cache notification: remember changes to our files so the next think() mentions them"""
+        for file_path in self.responsible_files:
+            if os.path.abspath(file_path) == path:
+                self.changed_files.add(file_path)
+
     async def process_file(self, file_path: str, changes: Dict):
         """Process changes to a specific file"""
         if file_path not in self.responsible_files:
@@ -54,8 +111,10 @@ Details: {details}
             return False
             
         try:
-            with open(file_path, 'r') as f:
-                current_content = f.read()
+            snapshot = self.file_cache.get(file_path)
+            if snapshot is None:
+                raise FileNotFoundError(f"No such file: '{file_path}'")
+            current_content = snapshot.content
             
             # Log the proposed changes
             self.log_action("Processing Changes", f"File: {file_path}, Changes: {json.dumps(changes, indent=2)}")
@@ -67,8 +126,7 @@ Details: {details}
                 # Here you'd implement partial changes
                 new_content = current_content  # Placeholder
             
-            with open(file_path, 'w') as f:
-                f.write(new_content)
+            self.file_cache.write(file_path, new_content)
                 
             return True
             
@@ -96,25 +154,35 @@ Details: {details}
                 "files_analyzed": ["file1", "file2"],
                 "findings": "analysis results"
             }
-        }"""
+        }
+        Context "files" maps each responsible file to its status: "full" (with "content"),
+        "diff" (unified diff since you last saw it), "unchanged" or "missing"."""
         
+        # Only record what the model has seen once it has actually answered
+        seen_files = dict(self.seen_files)
+        reported_changes = set(self.changed_files)
         context = {
             "responsible_files": self.responsible_files,
             "name": self.name,
-            "pending_messages": self.message_queue.qsize()
+            "pending_messages": self.message_queue.qsize(),
+            "files": self.file_cache.context_for(self.responsible_files, seen_files),
+            "changed_files": sorted(reported_changes)
         }
+        self.last_prompt_chars = len(json.dumps(context))
         
-        response = self.llm_handler.generate_response(
+        response = self.llm_handler.generate_json(
             'GROQ',
             json.dumps(context),
+            THINK_ACTION_SCHEMA,
             {"system_prompt": system_prompt}
         )
         
-        try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            self.log_action("Error", "Failed to parse LLM response")
+        if response is None:
+            self.log_action("Error", f"Failed to parse LLM response: {self.llm_handler.last_json_error}")
             return {}
+        self.seen_files = seen_files
+        self.changed_files -= reported_changes
+        return response
 
     async def run(self):
         """Main agent loop"""
@@ -145,4 +213,5 @@ Details: {details}
     def stop(self):
         """Stop the agent"""
         self.running = False
+        self.file_cache.unsubscribe(self.on_file_changed)
         self.log_action("Stopped", "Agent execution terminated") 
\ No newline at end of file
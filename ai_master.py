@@ -1,12 +1,12 @@
 import threading
 from queue import Queue
 import time
-from call_api import LLMCaller
+from call_api import create_llm_caller
 
 user_inputs = []
 input_queue = Queue()
 running = True
-llm_handler = LLMCaller()
+llm_handler = create_llm_caller()
 
 def input_thread():
     global running
@@ -0,0 +1,272 @@
+import io
+import json
+import time
+import random
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+# Providers whose batch APIs accept OpenAI-style chat completion JSONL
+OPENAI_STYLE_BATCH = {'OpenAI', 'GROQ'}
+BATCH_PROVIDERS = OPENAI_STYLE_BATCH | {'Anthropic'}
+# Per-job limits: (max requests, max JSONL bytes)
+BATCH_JOB_LIMITS = {
+    'OpenAI': (50_000, 200 * 1024 * 1024),
+    'GROQ': (50_000, 200 * 1024 * 1024),
+    'Anthropic': (100_000, 256 * 1024 * 1024),
+}
+
+def build_batch_request(api_name: str, custom_id: str, messages: List[Dict[str, str]], config: Dict[str, Any]) -> Dict:
+    """Serialize one chat request into the provider's batch line format"""
+    if api_name in OPENAI_STYLE_BATCH:
+        body = {
+            'model': config['model'],
+            'messages': messages,
+            'max_tokens': config.get('max_tokens'),
+            'temperature': config.get('temperature'),
+            'top_p': config.get('top_p'),
+            'presence_penalty': config.get('presence_penalty'),
+            'frequency_penalty': config.get('frequency_penalty'),
+        }
+        if api_name == 'OpenAI':
+            body['response_format'] = config.get('response_format')
+            body['seed'] = config.get('seed')
+        return {
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {k: v for k, v in body.items() if v is not None},
+        }
+    if api_name == 'Anthropic':
+        params = {
+            'model': config['model'],
+            'max_tokens': config.get('max_tokens'),
+            'messages': [m for m in messages if m['role'] != 'system'],
+            'temperature': config.get('temperature'),
+            'system': config.get('system_prompt'),
+            'metadata': config.get('metadata'),
+            'stop_sequences': config.get('stop_sequences'),
+        }
+        return {'custom_id': custom_id, 'params': {k: v for k, v in params.items() if v is not None}}
+    raise ValueError(f"Batch mode is not supported for {api_name}")
+
+def split_jobs(requests: List[Dict], max_requests: int, max_bytes: int) -> List[List[Dict]]:
+    """Group requests, in order, into jobs within the per-job request count and JSONL size limits"""
+    jobs: List[List[Dict]] = []
+    job: List[Dict] = []
+    job_bytes = 0
+    for request in requests:
+        size = len(json.dumps(request).encode('utf-8')) + 1
+        if job and (len(job) >= max_requests or job_bytes + size > max_bytes):
+            jobs.append(job)
+            job, job_bytes = [], 0
+        job.append(request)
+        job_bytes += size
+    if job:
+        jobs.append(job)
+    return jobs
+
+def parse_openai_batch_output(text: str) -> Dict[str, Tuple[bool, str]]:
+    """Map custom_id -> (succeeded, content or error) from an OpenAI/Groq output or error file"""
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get('response') or {}
+        if entry.get('error') or response.get('status_code') != 200:
+            error = entry.get('error') or response.get('body', {}).get('error') or 'request failed'
+            results[entry['custom_id']] = (False, str(error))
+        else:
+            results[entry['custom_id']] = (True, response['body']['choices'][0]['message']['content'])
+    return results
+
+class OpenAIBatchService:
+    """Files + Batches API flow shared by OpenAI and GROQ clients"""
+    TERMINAL = {'completed', 'failed', 'expired', 'cancelled'}
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[Dict]) -> str:
+        payload = '\n'.join(json.dumps(r) for r in requests).encode('utf-8')
+        batch_file = self.client.files.create(file=('batch.jsonl', io.BytesIO(payload)), purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+        return batch.id
+
+    def poll(self, batch_id: str) -> bool:
+        return self.client.batches.retrieve(batch_id).status in self.TERMINAL
+
+    def results(self, batch_id: str) -> Dict[str, Tuple[bool, str]]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if file_id:
+                results.update(parse_openai_batch_output(self.client.files.content(file_id).text))
+        return results
+
+class AnthropicBatchService:
+    """Message Batches API flow"""
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[Dict]) -> str:
+        return self.client.messages.batches.create(requests=requests).id
+
+    def poll(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == 'ended'
+
+    def results(self, batch_id: str) -> Dict[str, Tuple[bool, str]]:
+        results = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == 'succeeded':
+                results[entry.custom_id] = (True, entry.result.message.content[0].text)
+            else:
+                results[entry.custom_id] = (False, entry.result.type)
+        return results
+
+class LocalBatchService:
+    """In-process stand-in for a provider batch service, for dry runs and testing.
+
+    Requests complete after `latency` seconds; each one fails with probability
+    `failure_rate` so resubmission paths can be exercised.
+    """
+    def __init__(self, responder: Optional[Callable[[Dict], str]] = None, latency: float = 0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.responder = responder or self.echo
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.batches: Dict[str, Tuple[float, List[Dict]]] = {}
+
+    @staticmethod
+    def echo(request: Dict) -> str:
+        payload = request.get('body') or request.get('params')
+        return payload['messages'][-1]['content']
+
+    def submit(self, requests: List[Dict]) -> str:
+        batch_id = f"local-batch-{len(self.batches)}"
+        self.batches[batch_id] = (time.monotonic(), requests)
+        return batch_id
+
+    def poll(self, batch_id: str) -> bool:
+        submitted_at, _ = self.batches[batch_id]
+        return time.monotonic() - submitted_at >= self.latency
+
+    def results(self, batch_id: str) -> Dict[str, Tuple[bool, str]]:
+        _, requests = self.batches[batch_id]
+        results = {}
+        for request in requests:
+            if self.random.random() < self.failure_rate:
+                results[request['custom_id']] = (False, 'simulated failure')
+                continue
+            try:
+                results[request['custom_id']] = (True, self.responder(request))
+            except Exception as e:
+                results[request['custom_id']] = (False, str(e))
+        return results
+
+class BatchRunner:
+    """
+    Submit prompts as provider batch jobs, poll them and map results back to prompt indices
+
+    Requests are split into as many jobs as the provider's per-job request and
+    file size limits require; failed or missing entries are resubmitted up to
+    max_attempts times.
+    """
+    def __init__(self, llm, service=None, poll_interval: float = 30.0, max_attempts: int = 3,
+                 max_requests_per_job: Optional[int] = None, max_bytes_per_job: Optional[int] = None):
+        self.llm = llm
+        self.service = service
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        # Default to the provider's own limits; set these to split into smaller jobs
+        self.max_requests_per_job = max_requests_per_job
+        self.max_bytes_per_job = max_bytes_per_job
+        self.stats = {'submitted': 0, 'succeeded': 0, 'resubmitted': 0, 'failed': 0}
+
+    def service_for(self, api_name: str):
+        if self.service is not None:
+            return self.service
+        if api_name not in BATCH_PROVIDERS:
+            raise ValueError(f"Batch mode is not supported for {api_name}")
+        if not self.llm.api_keys.get(api_name):
+            raise ValueError(f"No API key found for {api_name}")
+        if api_name == 'OpenAI':
+            from openai import OpenAI
+            return OpenAIBatchService(OpenAI(api_key=self.llm.api_keys['OpenAI']))
+        if api_name == 'GROQ':
+            from groq import Groq
+            return OpenAIBatchService(Groq(api_key=self.llm.api_keys['GROQ']))
+        import anthropic
+        return AnthropicBatchService(anthropic.Anthropic(api_key=self.llm.api_keys['Anthropic']))
+
+    def job_limits(self, api_name: str) -> Tuple[int, int]:
+        max_requests, max_bytes = BATCH_JOB_LIMITS.get(api_name, BATCH_JOB_LIMITS['OpenAI'])
+        return self.max_requests_per_job or max_requests, self.max_bytes_per_job or max_bytes
+
+    def run(self, api_name: str, prompts: List[str], config: Optional[Dict[str, Any]] = None) -> List[str]:
+        service = self.service_for(api_name)
+        max_requests, max_bytes = self.job_limits(api_name)
+        final_config = self.llm.default_configs[api_name].copy()
+        if config:
+            final_config.update(config)
+
+        requests = {
+            f"chunk-{i}": build_batch_request(
+                api_name, f"chunk-{i}", self.llm._prepare_messages(prompt, final_config), final_config
+            )
+            for i, prompt in enumerate(prompts)
+        }
+        responses: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        pending = []
+        for custom_id, request in requests.items():
+            if len(json.dumps(request).encode('utf-8')) + 1 > max_bytes:
+                errors[custom_id] = f"request exceeds the {max_bytes}-byte batch job limit"
+                self.stats['failed'] += 1
+            else:
+                pending.append(custom_id)
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not pending:
+                break
+            if attempt > 1:
+                self.stats['resubmitted'] += len(pending)
+                print(f"\nResubmitting {len(pending)} failed requests (attempt {attempt}/{self.max_attempts})")
+            jobs = split_jobs([requests[custom_id] for custom_id in pending], max_requests, max_bytes)
+            batch_ids = []
+            for job in jobs:
+                batch_ids.append(service.submit(job))
+                self.stats['submitted'] += len(job)
+                print(f"\nSubmitted batch {batch_ids[-1]} with {len(job)} requests")
+
+            # Jobs run concurrently on the provider side; collect each one as it finishes
+            results: Dict[str, Tuple[bool, str]] = {}
+            running = list(batch_ids)
+            while running:
+                for batch_id in [b for b in running if service.poll(b)]:
+                    results.update(service.results(batch_id))
+                    running.remove(batch_id)
+                if running:
+                    time.sleep(self.poll_interval)
+
+            still_pending = []
+            for custom_id in pending:
+                ok, content = results.get(custom_id, (False, 'missing from batch output'))
+                if ok:
+                    responses[custom_id] = content
+                    errors.pop(custom_id, None)
+                else:
+                    errors[custom_id] = content
+                    still_pending.append(custom_id)
+            pending = still_pending
+
+        self.stats['succeeded'] += len(responses)
+        self.stats['failed'] += len(pending)
+        return [
+            responses.get(custom_id, f"Error processing chunk: {errors.get(custom_id)}")
+            for custom_id in requests
+        ]
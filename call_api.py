@@ -1,10 +1,15 @@
 import os
+import json
+import time
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
 from groq import Groq
 from openai import OpenAI
 import anthropic
 import google.generativeai as genai
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator, Callable, Tuple
+from json_stream import StreamingJSONValidator, SchemaViolation
 
 class LLMCaller:
     def __init__(self):
@@ -16,6 +21,33 @@ class LLMCaller:
             'OpenRouter': os.getenv('OPEN_ROUTER_API_KEY'),
             'Google Generative AI': os.getenv('GOOGLE_API_KEY'),
         }
+
+        # Single-flight bookkeeping: identical deterministic requests share one upstream call
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.coalesced_requests = 0
+        self.last_batch_stats: Dict[str, int] = {}
+
+        # Streaming JSON validation metrics (see generate_json)
+        self.json_stats = {
+            'requests': 0,
+            'valid': 0,
+            'aborted': 0,
+            'retries': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'wasted_chars': 0,
+            'time_to_valid_total': 0.0,
+        }
+        self.json_stats_lock = threading.Lock()
+        self.last_json_error: Optional[str] = None
+
+        # Optional callable(api_name) run before every upstream request, e.g. a shared rate budget
+        self.request_hook: Optional[Callable[[str], None]] = None
+
+        # SDK clients are created once per provider and reused so connections stay warm
+        self._clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
         
         # Updated configurations with temperature=0 and JSON mode
         self.default_configs = {
@@ -105,11 +137,250 @@ class LLMCaller:
         if config:
             final_config.update(config)
 
+        key = self._request_key(api_name, user_input, final_config, chat_history)
+        if key is None:
+            return self._call_handler(handler, api_name, user_input, final_config, chat_history)
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced_requests += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = self._call_handler(handler, api_name, user_input, final_config, chat_history)
+            future.set_result(result)
+            return result
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def stream_response(
+        self,
+        api_name: str,
+        user_input: str,
+        config: Optional[Dict[str, Any]] = None,
+        chat_history: Optional[List[Dict[str, str]]] = None
+    ) -> Iterator[str]:
+        """
+        Yield response text as it is generated. Closing the returned generator
+        closes the underlying stream, cancelling the rest of the generation.
+        Unlike generate_response, errors are raised rather than returned as text.
+        """
+        if not self.api_keys.get(api_name):
+            raise ValueError(f"No API key found for {api_name}")
+
+        handlers = {
+            'GROQ': self._stream_groq,
+            'OpenAI': self._stream_openai,
+            'Anthropic': self._stream_anthropic,
+            'Google Generative AI': self._stream_google,
+            'OpenRouter': self._stream_openrouter
+        }
+
+        handler = handlers.get(api_name)
+        if not handler:
+            raise ValueError("Invalid API name")
+
+        final_config = self.default_configs[api_name].copy()
+        if config:
+            final_config.update(config)
+        return handler(user_input, final_config, chat_history)
+
+    def generate_json(
+        self,
+        api_name: str,
+        user_input: str,
+        schema: Dict[str, Any],
+        config: Optional[Dict[str, Any]] = None,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        max_attempts: int = 3,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Stream a JSON response and validate it against schema as it arrives
+
+        The request is cancelled at the first character that makes a valid
+        result impossible, and retried with a repair prompt describing the
+        problem. Returns the parsed object, or None once max_attempts are used
+        up (the reason is kept in last_json_error). Setting cancel_event from
+        another thread abandons the stream at the next chunk and returns None.
+        """
+        result, error = self.generate_json_with_error(
+            api_name, user_input, schema, config, chat_history, max_attempts, cancel_event
+        )
+        self.last_json_error = error
+        return result
+
+    def generate_json_with_error(
+        self,
+        api_name: str,
+        user_input: str,
+        schema: Dict[str, Any],
+        config: Optional[Dict[str, Any]] = None,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        max_attempts: int = 3,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        generate_json returning (result, error) instead of setting last_json_error,
+        for callers that share one LLMCaller across threads. error is None on
+        success and "cancelled" when cancel_event stopped the call.
+        """
+        self._count_json('requests')
+        start = time.perf_counter()
+        prompt = user_input
+        error: Optional[str] = None
+
+        for attempt in range(1, max_attempts + 1):
+            validator = StreamingJSONValidator(schema)
+            received: List[str] = []
+            try:
+                stream = self.stream_response(api_name, prompt, config, chat_history)
+            except ValueError as err:
+                # Missing key or unknown provider: retrying cannot help
+                error = str(err)
+                break
+
+            schema_violation = False
+            try:
+                if self.request_hook is not None:
+                    self.request_hook(api_name)
+                for delta in stream:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    received.append(delta)
+                    validator.feed(delta)
+                    if validator.complete:
+                        # Anything after the document (closing fence, sign-off prose) is not needed
+                        break
+                if not validator.complete and cancel_event is not None and cancel_event.is_set():
+                    self._count_json('cancelled')
+                    self._count_json('wasted_chars', len(''.join(received)))
+                    return None, "cancelled"
+                validator.finish()
+                result = json.loads(validator.json_text)
+                self._count_json('valid')
+                self._count_json('time_to_valid_total', time.perf_counter() - start)
+                return result, None
+            except SchemaViolation as err:
+                self._count_json('aborted')
+                error = str(err)
+                schema_violation = True
+            except Exception as err:
+                error = f"An error occurred with {api_name}: {str(err)}"
+            finally:
+                stream.close()
+
+            partial = ''.join(received)
+            self._count_json('wasted_chars', len(partial))
+            if attempt < max_attempts:
+                self._count_json('retries')
+                # Only a rejected reply warrants a repair prompt; transport errors retry the original prompt
+                if schema_violation:
+                    prompt = self._repair_prompt(user_input, partial, error)
+                else:
+                    prompt = user_input
+
+        self._count_json('failed')
+        return None, error
+
+    def json_metrics(self) -> Dict[str, float]:
+        """Summary of generate_json: wasted completion tokens (estimated at ~4 chars/token) and mean time to a valid result"""
+        with self.json_stats_lock:
+            stats = dict(self.json_stats)
+        return {
+            **stats,
+            'wasted_tokens_estimate': stats['wasted_chars'] / 4,
+            'mean_time_to_valid': stats['time_to_valid_total'] / stats['valid'] if stats['valid'] else 0.0,
+        }
+
+    def _count_json(self, key: str, amount: float = 1) -> None:
+        # generate_json runs concurrently (races, gateway threads), so counters are updated under a lock
+        with self.json_stats_lock:
+            self.json_stats[key] += amount
+
+    def _repair_prompt(self, user_input: str, partial: str, error: str) -> str:
+        return f"""{user_input}
+
+Your previous reply was rejected: {error}
+It began with:
+{partial[:500]}
+
+Reply again with only a single JSON object in the required format."""
+
+    def generate_batch(
+        self,
+        api_name: str,
+        prompts: List[str],
+        config: Optional[Dict[str, Any]] = None,
+        service=None,
+        poll_interval: float = 30.0,
+        max_attempts: int = 3
+    ) -> List[str]:
+        """
+        Run prompts through the provider's batch API instead of the chat endpoint
+
+        Args:
+            api_name: GROQ, OpenAI or Anthropic
+            prompts: User inputs, one request each; results come back in the same order
+            config: Optional configuration overrides
+            service: Optional batch service to use instead of the provider's (e.g. LocalBatchService)
+            poll_interval: Seconds between batch status checks
+            max_attempts: How many times failed requests are submitted before giving up
+        """
+        from batch_api import BatchRunner
+        runner = BatchRunner(self, service=service, poll_interval=poll_interval, max_attempts=max_attempts)
+        responses = runner.run(api_name, prompts, config)
+        self.last_batch_stats = runner.stats
+        return responses
+
+    def _call_handler(self, handler, api_name: str, user_input: str, config: Dict[str, Any],
+                      chat_history: Optional[List[Dict[str, str]]] = None) -> str:
         try:
-            return handler(user_input, final_config, chat_history)
+            if self.request_hook is not None:
+                self.request_hook(api_name)
+            return handler(user_input, config, chat_history)
         except Exception as err:
             return f"An error occurred with {api_name}: {str(err)}"
 
+    def _request_key(self, api_name: str, user_input: str, config: Dict[str, Any],
+                     chat_history: Optional[List[Dict[str, str]]] = None) -> Optional[str]:
+        """Key identifying a request for coalescing, or None if the output is not deterministic"""
+        if config.get('temperature') != 0:
+            return None
+        return json.dumps([api_name, user_input, config, chat_history], sort_keys=True, default=str)
+
+    def _client(self, api_name: str):
+        with self._clients_lock:
+            if api_name not in self._clients:
+                if api_name == 'GROQ':
+                    client = Groq(api_key=self.api_keys['GROQ'])
+                elif api_name == 'OpenAI':
+                    client = OpenAI(api_key=self.api_keys['OpenAI'])
+                elif api_name == 'Anthropic':
+                    client = anthropic.Anthropic(api_key=self.api_keys['Anthropic'])
+                else:
+                    client = OpenAI(
+                        base_url="https://openrouter.ai/api/v1",
+                        api_key=self.api_keys['OpenRouter'],
+                        default_headers={
+                            "HTTP-Referer": "http://localhost:8000",
+                            "X-Title": "API Test"
+                        }
+                    )
+                self._clients[api_name] = client
+            return self._clients[api_name]
+
     def _prepare_messages(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
         messages = []
         if config.get('system_prompt'):
@@ -120,7 +391,7 @@ class LLMCaller:
         return messages
 
     def _handle_groq(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> str:
-        client = Groq(api_key=self.api_keys['GROQ'])
+        client = self._client('GROQ')
         messages = self._prepare_messages(user_input, config, chat_history)
         chat_completion = client.chat.completions.create(
             messages=messages,
@@ -134,7 +405,7 @@ class LLMCaller:
         return chat_completion.choices[0].message.content
 
     def _handle_openai(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> str:
-        client = OpenAI(api_key=self.api_keys['OpenAI'])
+        client = self._client('OpenAI')
         messages = self._prepare_messages(user_input, config, chat_history)
         chat_completion = client.chat.completions.create(
             messages=messages,
@@ -150,7 +421,7 @@ class LLMCaller:
         return chat_completion.choices[0].message.content
 
     def _handle_anthropic(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> str:
-        client = anthropic.Anthropic(api_key=self.api_keys['Anthropic'])
+        client = self._client('Anthropic')
         messages = self._prepare_messages(user_input, config, chat_history)
         message = client.messages.create(
             model=config['model'],
@@ -187,14 +458,7 @@ class LLMCaller:
         return response.text
 
     def _handle_openrouter(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> str:
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=self.api_keys['OpenRouter'],
-            default_headers={
-                "HTTP-Referer": "http://localhost:8000",
-                "X-Title": "API Test"
-            }
-        )
+        client = self._client('OpenRouter')
         messages = self._prepare_messages(user_input, config, chat_history)
         response = client.chat.completions.create(
             model=config['model'],
@@ -206,9 +470,108 @@ class LLMCaller:
         )
         return response.choices[0].message.content
 
+    def _stream_chat_completions(self, client, **kwargs) -> Iterator[str]:
+        stream = client.chat.completions.create(stream=True, **kwargs)
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            stream.close()
+
+    def _stream_groq(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        client = self._client('GROQ')
+        yield from self._stream_chat_completions(
+            client,
+            messages=self._prepare_messages(user_input, config, chat_history),
+            model=config['model'],
+            max_tokens=config.get('max_tokens'),
+            temperature=config.get('temperature'),
+            top_p=config.get('top_p'),
+            presence_penalty=config.get('presence_penalty'),
+            frequency_penalty=config.get('frequency_penalty')
+        )
+
+    def _stream_openai(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        client = self._client('OpenAI')
+        yield from self._stream_chat_completions(
+            client,
+            messages=self._prepare_messages(user_input, config, chat_history),
+            model=config['model'],
+            max_tokens=config.get('max_tokens'),
+            temperature=config.get('temperature'),
+            top_p=config.get('top_p'),
+            presence_penalty=config.get('presence_penalty'),
+            frequency_penalty=config.get('frequency_penalty'),
+            response_format=config.get('response_format'),
+            seed=config.get('seed')
+        )
+
+    def _stream_anthropic(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        client = self._client('Anthropic')
+        messages = [m for m in self._prepare_messages(user_input, config, chat_history) if m['role'] != 'system']
+        with client.messages.stream(
+            model=config['model'],
+            max_tokens=config.get('max_tokens'),
+            messages=messages,
+            temperature=config.get('temperature'),
+            system=config.get('system_prompt'),
+            metadata=config.get('metadata'),
+            stop_sequences=config.get('stop_sequences')
+        ) as stream:
+            yield from stream.text_stream
+
+    def _stream_google(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        genai.configure(api_key=self.api_keys['Google Generative AI'])
+        model = genai.GenerativeModel(
+            config['model'],
+            generation_config={
+                'temperature': config.get('temperature'),
+                'top_p': config.get('top_p'),
+                'top_k': config.get('top_k'),
+                'candidate_count': config.get('candidate_count'),
+                'stop_sequences': config.get('stop_sequences')
+            }
+        )
+
+        chat = model.start_chat(history=[])
+        if config.get('system_prompt'):
+            chat.send_message(config['system_prompt'])
+        if chat_history:
+            for msg in chat_history:
+                chat.send_message(msg['content'])
+
+        for chunk in chat.send_message(user_input, stream=True):
+            yield chunk.text
+
+    def _stream_openrouter(self, user_input: str, config: Dict[str, Any], chat_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        client = self._client('OpenRouter')
+        yield from self._stream_chat_completions(
+            client,
+            model=config['model'],
+            messages=self._prepare_messages(user_input, config, chat_history),
+            max_tokens=config.get('max_tokens'),
+            temperature=config.get('temperature'),
+            presence_penalty=config.get('presence_penalty'),
+            frequency_penalty=config.get('frequency_penalty')
+        )
+
+def create_llm_caller():
+    """
+    LLMCaller for scripts to use: a client for the shared local gateway when
+    LLM_GATEWAY_URL is set (see llm_gateway.py), otherwise an in-process caller
+    """
+    load_dotenv()
+    gateway_url = os.getenv('LLM_GATEWAY_URL')
+    if gateway_url:
+        from llm_gateway import GatewayClient
+        return GatewayClient(gateway_url)
+    return LLMCaller()
+
 def main():
     """Main function to run the API interaction loop."""
-    handler = LLMCaller()
+    handler = create_llm_caller()
     while True:
         print("\nSelect an API to interact with:")
         for i, api_name in enumerate(handler.api_keys.keys(), 1):
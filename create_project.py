@@ -1,12 +1,39 @@
-from call_api import LLMCaller
+from call_api import create_llm_caller
+from llm_gateway import GatewayClient
 import json
 import os
+import time
+import argparse
+import threading
 from pathlib import Path
-import re
 import subprocess
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-llm_handler = LLMCaller()
+llm_handler = create_llm_caller()
+
+# Schema for the generated project tree, used to abort invalid responses mid-stream
+PROJECT_STRUCTURE_SCHEMA = {
+    "type": "object",
+    "required": ["name", "type"],
+    "properties": {
+        "name": {"type": "string"},
+        "type": {"type": "string", "enum": ["directory", "file"]},
+        "content": {"type": "string"},
+        "children": {"type": "array", "items": {"$ref": "#"}}
+    }
+}
+
+# Providers that may take part in a race, as "API" or "API:model"
+RACE_CANDIDATES = [
+    'GROQ',
+    'OpenAI',
+    'Anthropic',
+    'OpenRouter',
+    'Google Generative AI',
+]
+RACE_STATS_FILE = "race_stats.json"
 
 def log_git_action(project_path: Path, action: str, output: str):
     """Log git actions to git_logs.txt"""
@@ -81,14 +108,6 @@ def get_system_prompt():
     with open("python_list_system_prompt.txt", "r") as f:
         return f.read()
 
-def clean_json_response(response: str) -> str:
-    """Remove markdown formatting and extract just the JSON"""
-    # Remove markdown code blocks and any text before/after
-    json_match = re.search(r'\{[\s\S]*\}', response)
-    if json_match:
-        return json_match.group()
-    return response
-
 def create_file_structure(structure, base_path):
     """Recursively create the file structure from JSON"""
     path = Path(base_path) / structure['name']
@@ -102,7 +121,113 @@ def create_file_structure(structure, base_path):
         with open(path, 'w') as f:
             f.write(structure.get('content', ''))
 
-def process_llm_input(text):
+def log_race(candidate_results: Dict[str, Tuple[str, float]], winner: Optional[str]):
+    """Log race outcome to race_logs.txt"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_path = Path.cwd() / "race_logs.txt"
+    timings = '\n'.join(
+        f"  {candidate}: {status} after {elapsed:.2f}s" for candidate, (status, elapsed) in candidate_results.items()
+    )
+
+    log_entry = f"""
+[{timestamp}] Race winner: {winner or 'none'}
+{timings}
+{'='*50}
+"""
+    with open(log_path, "a") as f:
+        f.write(log_entry)
+
+def load_race_stats() -> Dict[str, Dict[str, float]]:
+    try:
+        with open(RACE_STATS_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def update_race_stats(candidate_results: Dict[str, Tuple[str, float]], winner: Optional[str]):
+    """Accumulate per-candidate races, wins and time to a valid answer in race_stats.json"""
+    stats = load_race_stats()
+    for candidate, (status, elapsed) in candidate_results.items():
+        entry = stats.setdefault(candidate, {'races': 0, 'wins': 0, 'valid': 0, 'valid_seconds': 0.0})
+        entry['races'] += 1
+        if candidate == winner:
+            entry['wins'] += 1
+        if status in ('won', 'valid'):
+            entry['valid'] += 1
+            entry['valid_seconds'] += elapsed
+    with open(RACE_STATS_FILE, "w") as f:
+        json.dump(stats, f, indent=4)
+
+def default_race_candidates(size: int = 3) -> List[str]:
+    """
+    Candidates ranked by past win rate (untried ones get an even chance), then speed
+
+    Draws from RACE_CANDIDATES plus every "API" or "API:model" that has raced before,
+    so models pinned with --providers compete for default slots on their record.
+    """
+    stats = load_race_stats()
+
+    def score(candidate: str):
+        entry = stats.get(candidate, {})
+        win_rate = (entry.get('wins', 0) + 1) / (entry.get('races', 0) + 2)
+        mean_seconds = entry['valid_seconds'] / entry['valid'] if entry.get('valid') else float('inf')
+        return (-win_rate, mean_seconds)
+
+    candidates = RACE_CANDIDATES + [c for c in stats if c not in RACE_CANDIDATES]
+    available = [c for c in candidates if llm_handler.api_keys.get(c.partition(':')[0])]
+    return sorted(available, key=score)[:size]
+
+def race_project_structure(text: str, config: Dict, candidates: List[str]) -> Optional[Dict]:
+    """Send the prompt to every candidate at once and keep the first valid project structure"""
+    if not candidates:
+        raise ValueError("No race candidates: configure a provider API key or pass --providers")
+    cancel = threading.Event()
+    start = time.perf_counter()
+    results: Dict[str, Tuple[str, float]] = {}
+    winner = None
+    winning_response = None
+
+    def run(candidate: str):
+        api_name, _, model = candidate.partition(':')
+        candidate_config = dict(config, model=model) if model else config
+        response, error = llm_handler.generate_json_with_error(
+            api_name, text, PROJECT_STRUCTURE_SCHEMA, candidate_config, max_attempts=1, cancel_event=cancel
+        )
+        if response is not None:
+            status = 'valid'
+        else:
+            # Decided by how this call stopped: an invalid reply after the winner is still invalid
+            status = 'cancelled' if error == "cancelled" else 'invalid'
+        return response, status, time.perf_counter() - start
+
+    executor = ThreadPoolExecutor(max_workers=len(candidates))
+    futures = {executor.submit(run, candidate): candidate for candidate in candidates}
+    for future in as_completed(futures):
+        candidate = futures[future]
+        response, status, elapsed = future.result()
+        if response is None:
+            results[candidate] = (status, elapsed)
+            continue
+        winner, winning_response = candidate, response
+        results[candidate] = ('won', elapsed)
+        print(f"\n{candidate} won the race in {elapsed:.2f}s")
+        cancel.set()
+        break
+    executor.shutdown(wait=False)
+
+    def record_results():
+        # Losers stop at their next chunk; log their timings without holding up the winner
+        for future, candidate in futures.items():
+            if candidate not in results:
+                _, status, elapsed = future.result()
+                results[candidate] = (status, elapsed)
+        log_race(results, winner)
+        update_race_stats(results, winner)
+
+    threading.Thread(target=record_results, name="race-results").start()
+    return winning_response
+
+def process_llm_input(text, race_candidates: Optional[List[str]] = None):
     # Save the project description
     with open("project_prompt.txt", "w") as f:
         f.write(text)
@@ -113,16 +238,19 @@ def process_llm_input(text):
         'system_prompt': system_prompt
     }
     
-    # Make LLM call
-    response = llm_handler.generate_response('GROQ', text, config)
+    if race_candidates is not None:
+        json_response = race_project_structure(text, config, race_candidates)
+        if json_response is None:
+            print("\nError: no provider returned a valid project structure")
+            return
+    else:
+        # Make LLM call, validating the streamed JSON and retrying on invalid output
+        json_response = llm_handler.generate_json('GROQ', text, PROJECT_STRUCTURE_SCHEMA, config)
+        if json_response is None:
+            print(f"\nError: LLM response was not a valid project structure: {llm_handler.last_json_error}")
+            return
     
     try:
-        # Clean the response
-        cleaned_response = clean_json_response(response)
-        
-        # Parse the response to ensure it's valid JSON
-        json_response = json.loads(cleaned_response)
-        
         # Save the response as formatted JSON
         with open("project_structure.json", "w") as f:
             json.dump(json_response, f, indent=4)
@@ -143,18 +271,36 @@ def process_llm_input(text):
         # Initialize git repository
         setup_git(project_path, text)
         
-    except json.JSONDecodeError as e:
-        print(f"\nError: LLM response was not valid JSON: {e}")
-        print("Raw response:", response)
     except Exception as e:
         print(f"\nError creating project structure: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate a project skeleton from a description")
+    parser.add_argument('--race', action='store_true',
+                        help="Query several providers at once and keep the first valid structure")
+    parser.add_argument('--providers', nargs='+', metavar='API[:MODEL]',
+                        help="Race candidates (default: best performers from race_stats.json)")
+    parser.add_argument('--race-size', type=int, default=3, help="Number of default race candidates")
+    args = parser.parse_args()
+
+    race_candidates = None
+    if args.race:
+        if isinstance(llm_handler, GatewayClient):
+            # Losing streams run inside the gateway and could not be cancelled from here
+            print("\nError: --race is not supported while LLM_GATEWAY_URL is set")
+            return
+        race_candidates = args.providers or default_race_candidates(args.race_size)
+        if not race_candidates:
+            print("\nError: no race candidates. Configure a provider API key, pass --providers, "
+                  "or use a --race-size above 0")
+            return
+        print(f"\nRacing: {', '.join(race_candidates)}")
+
     print("\nWhat project would you like to create? (Describe your project)")
     project_desc = input("> ")
     
     print(f"\nProcessing project request: {project_desc}")
-    process_llm_input(project_desc)
+    process_llm_input(project_desc, race_candidates)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,136 @@
+import os
+import difflib
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Callable, Any, Tuple
+
+@dataclass(frozen=True)
+class FileSnapshot:
+    path: str
+    content: str
+    sha256: str
+    mtime_ns: int
+    size: int
+    version: int
+
+class FileSnapshotCache:
+    """
+    In-memory snapshots of project files shared by all agents
+
+    A cached snapshot is reused while the file's mtime and size are unchanged;
+    otherwise the file is re-read once and its hash decides whether it really
+    changed. Subscribers are notified with (path, snapshot) on every real change,
+    including writes made through write().
+    """
+    def __init__(self):
+        self.snapshots: Dict[str, FileSnapshot] = {}
+        self.subscribers: List[Callable[[str, FileSnapshot], None]] = []
+        self.lock = threading.RLock()
+        self.stats = {'reads': 0, 'hits': 0, 'changes': 0}
+
+    def subscribe(self, callback: Callable[[str, FileSnapshot], None]) -> None:
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, FileSnapshot], None]) -> None:
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def get(self, path: str) -> Optional[FileSnapshot]:
+        """Current snapshot of path, or None if the file does not exist"""
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except FileNotFoundError:
+            with self.lock:
+                self.snapshots.pop(key, None)
+            return None
+
+        with self.lock:
+            cached = self.snapshots.get(key)
+            if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                self.stats['hits'] += 1
+                return cached
+
+            with open(key, 'rb') as f:
+                data = f.read()
+            self.stats['reads'] += 1
+            snapshot, callbacks = self._store(key, data, stat, cached)
+        self._notify(callbacks, key, snapshot)
+        return snapshot
+
+    def write(self, path: str, content: str) -> FileSnapshot:
+        """Write content to path and update the snapshot without re-reading it"""
+        key = os.path.abspath(path)
+        data = content.encode('utf-8')
+        with self.lock:
+            with open(key, 'wb') as f:
+                f.write(data)
+            snapshot, callbacks = self._store(key, data, os.stat(key), self.snapshots.get(key))
+        self._notify(callbacks, key, snapshot)
+        return snapshot
+
+    @staticmethod
+    def _notify(callbacks: List[Callable[[str, FileSnapshot], None]], key: str, snapshot: FileSnapshot) -> None:
+        # Called after the lock is released so a slow subscriber cannot stall other agents' get()
+        for callback in callbacks:
+            callback(key, snapshot)
+
+    def _store(self, key: str, data: bytes, stat: os.stat_result,
+               cached: Optional[FileSnapshot]) -> Tuple[FileSnapshot, List[Callable[[str, FileSnapshot], None]]]:
+        """Record a snapshot (lock held); returns it with the subscribers to notify of a real change"""
+        digest = hashlib.sha256(data).hexdigest()
+        changed = cached is None or cached.sha256 != digest
+        snapshot = FileSnapshot(
+            path=key,
+            content=data.decode('utf-8', errors='replace') if changed else cached.content,
+            sha256=digest,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            version=cached.version + 1 if cached and changed else (cached.version if cached else 1)
+        )
+        self.snapshots[key] = snapshot
+        if changed and cached is not None:
+            self.stats['changes'] += 1
+            return snapshot, list(self.subscribers)
+        return snapshot, []
+
+    def context_for(self, paths: List[str], seen: Dict[str, FileSnapshot]) -> Dict[str, Dict[str, Any]]:
+        """
+        Token-lean view of paths for a reader who last saw the snapshots in seen
+
+        Files are sent in full the first time, as a unified diff once they have
+        changed (or in full again if the diff would be larger), and only marked
+        unchanged otherwise. seen is updated to the snapshots returned.
+        """
+        context = {}
+        for path in paths:
+            snapshot = self.get(path)
+            previous = seen.get(path)
+            if snapshot is None:
+                context[path] = {'status': 'missing'}
+                seen.pop(path, None)
+                continue
+
+            if previous is None:
+                context[path] = {'status': 'full', 'content': snapshot.content}
+            elif previous.sha256 == snapshot.sha256:
+                context[path] = {'status': 'unchanged'}
+            else:
+                diff = ''.join(difflib.unified_diff(
+                    previous.content.splitlines(keepends=True),
+                    snapshot.content.splitlines(keepends=True),
+                    fromfile=f"{path}@{previous.version}",
+                    tofile=f"{path}@{snapshot.version}"
+                ))
+                if len(diff) < len(snapshot.content):
+                    context[path] = {'status': 'diff', 'diff': diff}
+                else:
+                    context[path] = {'status': 'full', 'content': snapshot.content}
+            seen[path] = snapshot
+        return context
+
+# Default cache shared by every Agent in the process
+shared_file_cache = FileSnapshotCache()
@@ -0,0 +1,260 @@
+import re
+import json
+from typing import Dict, Any, List, Optional
+
+# Prefix of a JSON number that may still grow into a valid one
+NUMBER_PREFIX = re.compile(r'-?(0|[1-9]\d*)?(\.\d*)?([eE][+-]?\d*)?')
+LITERALS = {'t': 'true', 'f': 'false', 'n': 'null'}
+ROOT_OPENERS = {'object': '{', 'array': '['}
+VALUE_KINDS = {'{': 'object', '[': 'array', '"': 'string', 't': 'boolean', 'f': 'boolean', 'n': 'null'}
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class SchemaViolation(ValueError):
+    """Raised as soon as streamed output can no longer become a valid response"""
+
+class StreamingJSONValidator:
+    """
+    Validate JSON text chunk by chunk against a small JSON-schema subset
+
+    Supports type, properties, required, additionalProperties, items, enum and
+    '$ref': '#' for recursive schemas. The root must be an object or array.
+    Text before the first '{' or '[' the root type allows (prose, a markdown
+    code fence) is skipped, and text after a complete document is ignored;
+    callers can stop reading once complete is set.
+
+    feed() raises SchemaViolation at the first character that rules out a
+    valid document, so the caller can cancel the request instead of paying
+    for the rest.
+    """
+    def __init__(self, schema: Dict[str, Any]):
+        self.root_schema = schema
+        self.stack: List[Dict[str, Any]] = []
+        self.scalar: Optional[Dict[str, Any]] = None
+        self.chars: List[str] = []
+        self.started = False
+        self.complete = False
+
+        root_type = self._resolve(schema).get('type')
+        if root_type is None:
+            self.root_openers = '{['
+        else:
+            root_types = [root_type] if isinstance(root_type, str) else root_type
+            self.root_openers = ''.join(ROOT_OPENERS.get(t, '') for t in root_types)
+
+    @property
+    def json_text(self) -> str:
+        return ''.join(self.chars)
+
+    def feed(self, text: str) -> None:
+        for char in text:
+            self._feed_char(char)
+
+    def finish(self) -> None:
+        """Call once the stream has ended"""
+        if self.scalar is not None and self.scalar['kind'] == 'literal':
+            self._finish_literal()
+        if not self.complete:
+            raise SchemaViolation("response ended before the JSON document was complete")
+
+    def _fail(self, reason: str):
+        path = '.'.join(str(f['key']) for f in self.stack if f['kind'] == 'object' and f['key'] is not None)
+        raise SchemaViolation(f"{reason} at {path or 'root'} (after {len(self.chars)} chars)")
+
+    def _feed_char(self, char: str) -> None:
+        if self.complete:
+            return
+        if not self.started:
+            if char not in self.root_openers:
+                return
+            self.started = True
+
+        self.chars.append(char)
+        if self.scalar is not None:
+            if self.scalar['kind'] == 'string':
+                self._string_char(char)
+                return
+            if char.isalnum() or char in '+-.':
+                self.scalar['buf'].append(char)
+                self._check_literal_prefix()
+                return
+            self._finish_literal()
+        self._structural_char(char)
+
+    def _structural_char(self, char: str) -> None:
+        if char.isspace():
+            return
+        if not self.stack:
+            self._begin_value(char, self.root_schema)
+            return
+
+        frame = self.stack[-1]
+        state = frame['state']
+        if frame['kind'] == 'object':
+            if state in ('key_or_end', 'key'):
+                if char == '"':
+                    self.scalar = {'kind': 'string', 'role': 'key', 'schema': frame['schema'],
+                                   'buf': [], 'escape': False, 'unicode': 0, 'exact': True}
+                elif char == '}' and state == 'key_or_end':
+                    self._close_object()
+                else:
+                    self._fail(f"expected an object key, got {char!r}")
+            elif state == 'colon':
+                if char != ':':
+                    self._fail(f"expected ':', got {char!r}")
+                frame['state'] = 'value'
+            elif state == 'value':
+                self._begin_value(char, self._property_schema(frame['schema'], frame['key']))
+            elif char == ',':
+                frame['state'] = 'key'
+            elif char == '}':
+                self._close_object()
+            else:
+                self._fail(f"expected ',' or '}}', got {char!r}")
+        else:
+            if state in ('value_or_end', 'value'):
+                if char == ']' and state == 'value_or_end':
+                    self._close_array()
+                else:
+                    self._begin_value(char, frame['schema'].get('items', {}))
+            elif char == ',':
+                frame['state'] = 'value'
+            elif char == ']':
+                self._close_array()
+            else:
+                self._fail(f"expected ',' or ']', got {char!r}")
+
+    def _resolve(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return self.root_schema if schema.get('$ref') == '#' else schema
+
+    def _property_schema(self, schema: Dict[str, Any], key: str) -> Dict[str, Any]:
+        properties = schema.get('properties', {})
+        if key in properties:
+            return properties[key]
+        additional = schema.get('additionalProperties', True)
+        return additional if isinstance(additional, dict) else {}
+
+    def _begin_value(self, char: str, schema: Dict[str, Any]) -> None:
+        schema = self._resolve(schema)
+        kind = VALUE_KINDS.get(char)
+        if kind is None and (char == '-' or char.isdigit()):
+            kind = 'number'
+        if kind is None:
+            self._fail(f"unexpected {char!r} where a value should start")
+
+        allowed = schema.get('type')
+        if allowed is not None:
+            allowed = [allowed] if isinstance(allowed, str) else allowed
+            if kind not in allowed and not (kind == 'number' and 'integer' in allowed):
+                self._fail(f"expected {'/'.join(allowed)}, got {kind}")
+
+        if self.stack:
+            self.stack[-1]['state'] = 'comma_or_end'
+        if kind == 'object':
+            self.stack.append({'kind': 'object', 'schema': schema, 'state': 'key_or_end', 'keys': set(), 'key': None})
+        elif kind == 'array':
+            self.stack.append({'kind': 'array', 'schema': schema, 'state': 'value_or_end', 'key': None})
+        elif kind == 'string':
+            self.scalar = {'kind': 'string', 'role': 'value', 'schema': schema,
+                           'buf': [], 'escape': False, 'unicode': 0, 'exact': True}
+            self._check_string_prefix()
+        else:
+            self.scalar = {'kind': 'literal', 'schema': schema, 'buf': [char]}
+            self._check_literal_prefix()
+
+    def _string_char(self, char: str) -> None:
+        scalar = self.scalar
+        if scalar['unicode']:
+            if char not in '0123456789abcdefABCDEF':
+                self._fail("invalid \\u escape")
+            scalar['unicode'] -= 1
+            return
+        if scalar['escape']:
+            scalar['escape'] = False
+            if char == 'u':
+                scalar['unicode'] = 4
+                scalar['exact'] = False
+                return
+            if char not in ESCAPES:
+                self._fail(f"invalid escape \\{char}")
+            scalar['buf'].append(ESCAPES[char])
+        elif char == '\\':
+            scalar['escape'] = True
+            return
+        elif char == '"':
+            self._finish_string()
+            return
+        elif ord(char) < 0x20:
+            self._fail("control character inside a string")
+        else:
+            scalar['buf'].append(char)
+        self._check_string_prefix()
+
+    def _check_string_prefix(self) -> None:
+        scalar = self.scalar
+        if not scalar['exact']:
+            return
+        value = ''.join(scalar['buf'])
+        if scalar['role'] == 'key':
+            schema = scalar['schema']
+            if schema.get('additionalProperties') is False:
+                if not any(name.startswith(value) for name in schema.get('properties', {})):
+                    self._fail(f"unexpected key {value!r}")
+        else:
+            enum = scalar['schema'].get('enum')
+            if enum and not any(isinstance(option, str) and option.startswith(value) for option in enum):
+                self._fail(f"{value!r} cannot match any of {enum}")
+
+    def _finish_string(self) -> None:
+        scalar = self.scalar
+        value = ''.join(scalar['buf'])
+        self.scalar = None
+        if scalar['role'] == 'key':
+            frame = self.stack[-1]
+            schema = frame['schema']
+            if schema.get('additionalProperties') is False and value not in schema.get('properties', {}):
+                self._fail(f"unexpected key {value!r}")
+            frame['key'] = value
+            frame['keys'].add(value)
+            frame['state'] = 'colon'
+            return
+        enum = scalar['schema'].get('enum')
+        if enum and scalar['exact'] and value not in enum:
+            self._fail(f"{value!r} is not one of {enum}")
+        self._value_done()
+
+    def _check_literal_prefix(self) -> None:
+        text = ''.join(self.scalar['buf'])
+        literal = LITERALS.get(text[0])
+        if literal is not None:
+            if not literal.startswith(text):
+                self._fail(f"invalid literal {text!r}")
+        elif not NUMBER_PREFIX.fullmatch(text):
+            self._fail(f"invalid number {text!r}")
+
+    def _finish_literal(self) -> None:
+        scalar = self.scalar
+        text = ''.join(scalar['buf'])
+        self.scalar = None
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            self._fail(f"invalid literal {text!r}")
+        allowed = scalar['schema'].get('type')
+        if allowed == 'integer' and not isinstance(value, int):
+            self._fail(f"expected integer, got {text!r}")
+        self._value_done()
+
+    def _close_object(self) -> None:
+        frame = self.stack.pop()
+        missing = [key for key in frame['schema'].get('required', []) if key not in frame['keys']]
+        if missing:
+            self._fail(f"missing required keys {missing}")
+        self._value_done()
+
+    def _close_array(self) -> None:
+        self.stack.pop()
+        self._value_done()
+
+    def _value_done(self) -> None:
+        if not self.stack:
+            self.complete = True
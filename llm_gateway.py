@@ -0,0 +1,340 @@
+import json
+import time
+import select
+import argparse
+import threading
+import http.client
+from collections import OrderedDict
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional, List, Tuple
+from call_api import LLMCaller
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+class GatewayError(RuntimeError):
+    """The gateway answered with an error status"""
+
+# Failures of the gateway itself (stopped, restarted, unreachable, bad reply) rather than of the LLM call
+GATEWAY_FAILURES = (OSError, http.client.HTTPException, GatewayError, json.JSONDecodeError)
+
+class RateBudget:
+    """Machine-wide requests-per-minute budget, one per provider"""
+    def __init__(self, requests_per_minute: Optional[Dict[str, int]] = None):
+        self.intervals = {name: 60.0 / rpm for name, rpm in (requests_per_minute or {}).items() if rpm}
+        self.next_start: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, api_name: str) -> None:
+        interval = self.intervals.get(api_name)
+        if not interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start.get(api_name, 0.0))
+            self.next_start[api_name] = start + interval
+        if start > now:
+            time.sleep(start - now)
+
+class LLMGateway:
+    """One warm LLMCaller plus rate budget, response cache and metrics, shared by every client"""
+    # Batch jobs run for minutes to hours, far beyond one HTTP request, so clients run them in-process
+    METHODS = ('generate_response', 'generate_json')
+
+    def __init__(self, llm: Optional[LLMCaller] = None, requests_per_minute: Optional[Dict[str, int]] = None,
+                 cache_size: int = 1024):
+        self.llm = llm or LLMCaller()
+        self.rate_budget = RateBudget(requests_per_minute)
+        # Charged once per upstream request, so generate_json retries and coalesced duplicates are counted correctly
+        self.llm.request_hook = self.rate_budget.acquire
+        self.cache: OrderedDict = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.metrics = {'requests': 0, 'cache_hits': 0, 'errors': 0, 'busy_seconds': 0.0}
+
+    def call(self, method: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown method {method}")
+        start = time.perf_counter()
+        with self.lock:
+            self.metrics['requests'] += 1
+
+        key = self._cache_key(method, kwargs)
+        with self.lock:
+            if key is not None and key in self.cache:
+                self.cache.move_to_end(key)
+                self.metrics['cache_hits'] += 1
+                return {'result': self.cache[key]}
+
+        if method == 'generate_json':
+            # The error must come from this call, not the LLMCaller shared by every handler thread
+            result, error = self.llm.generate_json_with_error(**kwargs)
+            reply = {'result': result, 'last_json_error': error}
+        else:
+            result = self.llm.generate_response(**kwargs)
+            reply = {'result': result}
+
+        with self.lock:
+            self.metrics['busy_seconds'] += time.perf_counter() - start
+            if self._is_error(method, result):
+                self.metrics['errors'] += 1
+            elif key is not None:
+                self.cache[key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return reply
+
+    def _cache_key(self, method: str, kwargs: Dict[str, Any]) -> Optional[str]:
+        """Only deterministic single requests are cached, mirroring LLMCaller's coalescing rule"""
+        if kwargs.get('api_name') not in self.llm.default_configs:
+            return None
+        config = self.llm.default_configs[kwargs['api_name']].copy()
+        config.update(kwargs.get('config') or {})
+        key = self.llm._request_key(kwargs['api_name'], kwargs['user_input'], config, kwargs.get('chat_history'))
+        if key is None:
+            return None
+        return json.dumps([method, key, kwargs.get('schema')], sort_keys=True)
+
+    @staticmethod
+    def _is_error(method: str, result: Any) -> bool:
+        if method == 'generate_json':
+            return result is None
+        if method == 'generate_response':
+            return result.startswith(("An error occurred", "No API key found", "Invalid API name"))
+        return False
+
+    def info(self) -> Dict[str, Any]:
+        return {'api_keys': {name: bool(key) for name, key in self.llm.api_keys.items()}}
+
+    def snapshot_metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            metrics = dict(self.metrics)
+            metrics['cache_entries'] = len(self.cache)
+        metrics['coalesced_requests'] = self.llm.coalesced_requests
+        metrics['json'] = self.llm.json_metrics()
+        return metrics
+
+def make_handler(gateway: LLMGateway):
+    class GatewayRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if self.path == '/info':
+                self._reply(200, gateway.info())
+            elif self.path == '/metrics':
+                self._reply(200, gateway.snapshot_metrics())
+            else:
+                self._reply(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/call':
+                self._reply(404, {'error': f"Unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                self._reply(200, gateway.call(body['method'], body.get('kwargs', {})))
+            except Exception as e:
+                self._reply(400, {'error': str(e)})
+
+        def _reply(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GatewayRequestHandler
+
+def serve(gateway: LLMGateway, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Create the gateway HTTP server; call serve_forever() on the result"""
+    server = ThreadingHTTPServer((host, port), make_handler(gateway))
+    server.daemon_threads = True
+    return server
+
+class GatewayClient:
+    """Drop-in stand-in for LLMCaller that forwards calls to a running gateway"""
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 600.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or DEFAULT_HOST
+        self.port = parsed.port or DEFAULT_PORT
+        self.timeout = timeout
+        self.local = threading.local()
+        self.last_json_error: Optional[str] = None
+        self.last_batch_stats: Dict[str, int] = {}
+        self._api_keys: Optional[Dict[str, bool]] = None
+        self._local_llm: Optional[LLMCaller] = None
+
+    @property
+    def api_keys(self) -> Dict[str, bool]:
+        """Which providers the gateway has keys for (the keys themselves never leave the gateway)"""
+        if self._api_keys is None:
+            try:
+                self._api_keys = self._request('GET', '/info')['api_keys']
+            except GATEWAY_FAILURES:
+                # Not cached, so the next access retries once the gateway is back
+                return {}
+        return self._api_keys
+
+    def generate_response(self, api_name: str, user_input: str, config: Optional[Dict[str, Any]] = None,
+                          chat_history: Optional[List[Dict[str, str]]] = None) -> str:
+        try:
+            return self._call('generate_response', api_name=api_name, user_input=user_input,
+                              config=config, chat_history=chat_history)['result']
+        except GATEWAY_FAILURES as err:
+            # Same contract as LLMCaller.generate_response: failures come back as text, never raise
+            return f"An error occurred with {api_name}: LLM gateway unavailable: {str(err)}"
+
+    def generate_json(self, api_name: str, user_input: str, schema: Dict[str, Any],
+                      config: Optional[Dict[str, Any]] = None, chat_history: Optional[List[Dict[str, str]]] = None,
+                      max_attempts: int = 3, cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        result, self.last_json_error = self.generate_json_with_error(
+            api_name, user_input, schema, config, chat_history, max_attempts, cancel_event
+        )
+        return result
+
+    def generate_json_with_error(self, api_name: str, user_input: str, schema: Dict[str, Any],
+                                 config: Optional[Dict[str, Any]] = None,
+                                 chat_history: Optional[List[Dict[str, str]]] = None, max_attempts: int = 3,
+                                 cancel_event: Optional[threading.Event] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        if cancel_event is not None:
+            # The upstream stream lives in the gateway process, out of reach of a local Event
+            raise ValueError("cancel_event is not supported through the LLM gateway")
+        try:
+            reply = self._call('generate_json', api_name=api_name, user_input=user_input, schema=schema,
+                               config=config, chat_history=chat_history, max_attempts=max_attempts)
+        except GATEWAY_FAILURES as err:
+            return None, f"An error occurred with {api_name}: LLM gateway unavailable: {str(err)}"
+        return reply['result'], reply.get('last_json_error')
+
+    def generate_batch(self, api_name: str, prompts: List[str], config: Optional[Dict[str, Any]] = None,
+                       service=None, poll_interval: float = 30.0, max_attempts: int = 3) -> List[str]:
+        """Batch jobs outlive any single gateway request, so they are submitted and polled from this process"""
+        if self._local_llm is None:
+            self._local_llm = LLMCaller()
+        responses = self._local_llm.generate_batch(api_name, prompts, config, service, poll_interval, max_attempts)
+        self.last_batch_stats = self._local_llm.last_batch_stats
+        return responses
+
+    def metrics(self) -> Dict[str, Any]:
+        return self._request('GET', '/metrics')
+
+    def _call(self, method: str, **kwargs) -> Dict[str, Any]:
+        return self._request('POST', '/call', {'method': method, 'kwargs': kwargs})
+
+    def _request(self, verb: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(verb, path, body=body, headers=headers)
+            except (http.client.HTTPException, ConnectionError):
+                # Nothing reached the gateway yet, so reconnecting and resending is safe
+                self._drop_connection()
+                if attempt:
+                    raise
+                continue
+            try:
+                response = connection.getresponse()
+                reply = json.loads(response.read())
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._drop_connection()
+                # The gateway may already have started a paid upstream call; only reads are resent
+                if attempt or verb != 'GET':
+                    raise
+        if response.status != 200:
+            raise GatewayError(f"Gateway error: {reply.get('error')}")
+        return reply
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None and connection.sock is not None:
+            # An idle keep-alive socket that is readable has been closed by the gateway (e.g. a restart)
+            if select.select([connection.sock], [], [], 0)[0]:
+                self._drop_connection()
+                connection = None
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def _drop_connection(self) -> None:
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self.local.connection = None
+
+def benchmark(requests: int = 2000) -> Dict[str, float]:
+    """Per-request overhead of going through the gateway versus calling LLMCaller in-process"""
+    llm = LLMCaller()
+    llm.api_keys['GROQ'] = llm.api_keys['GROQ'] or 'benchmark'
+    llm._handle_groq = lambda user_input, config, chat_history=None: user_input
+    # Non-zero temperature keeps coalescing and the response cache out of the measurement
+    config = {'temperature': 0.5}
+
+    start = time.perf_counter()
+    for i in range(requests):
+        llm.generate_response('GROQ', f"prompt {i}", config)
+    in_process = (time.perf_counter() - start) / requests
+
+    server = serve(LLMGateway(llm), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = GatewayClient(f"http://{DEFAULT_HOST}:{server.server_address[1]}")
+        client.generate_response('GROQ', "warmup", config)
+        start = time.perf_counter()
+        for i in range(requests):
+            client.generate_response('GROQ', f"prompt {i}", config)
+        via_gateway = (time.perf_counter() - start) / requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'requests': requests,
+        'in_process_ms': in_process * 1000,
+        'gateway_ms': via_gateway * 1000,
+        'overhead_ms': (via_gateway - in_process) * 1000,
+    }
+
+def parse_rpm(values: List[str]) -> Dict[str, int]:
+    limits = {}
+    for value in values:
+        name, _, rpm = value.rpartition('=')
+        limits[name] = int(rpm)
+    return limits
+
+def main():
+    parser = argparse.ArgumentParser(description="Local LLM gateway shared by all scripts (set LLM_GATEWAY_URL to use it)")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--rpm', action='append', default=[], metavar='API=N',
+                        help="Requests per minute for a provider, e.g. --rpm GROQ=30 (repeatable)")
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--bench', type=int, metavar='N', help="Benchmark gateway overhead over N requests and exit")
+    args = parser.parse_args()
+
+    if args.bench:
+        print(json.dumps(benchmark(args.bench), indent=2))
+        return
+
+    gateway = LLMGateway(requests_per_minute=parse_rpm(args.rpm), cache_size=args.cache_size)
+    server = serve(gateway, args.host, args.port)
+    print(f"LLM gateway listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down gateway.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
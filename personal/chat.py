@@ -1,9 +1,9 @@
-from call_api import LLMCaller
+from call_api import create_llm_caller
 from typing import Optional, Dict, Any, List
 
 class Chat:
     def __init__(self):
-        self.llm = LLMCaller()
+        self.llm = create_llm_caller()
         self.chat_history: List[Dict[str, str]] = []
         
         # Load system prompt from file
@@ -1,17 +1,29 @@
-from call_api import LLMCaller
+from call_api import LLMCaller, create_llm_caller
+from batch_api import LocalBatchService
+from llm_gateway import RateBudget
+import os
 import re
-from typing import List, Optional, Dict
+import glob
+import time
+import argparse
+from typing import List, Optional, Dict, Tuple
 from pathlib import Path
 import nltk
 from nltk.tokenize import sent_tokenize
 import asyncio
 import aiohttp
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 nltk.download('punkt', quiet=True)
 
+def segment_file(path: str) -> List[str]:
+    """Split a file into sentences (top-level so it can run in a process pool)"""
+    content = Path(path).read_text(encoding='utf-8', errors='replace')
+    return sent_tokenize(content)
+
 class ContentProcessor:
-    def __init__(self, input_file: str = 'content.txt', output_file: str = 'output.txt', max_concurrent: int = 5):
-        self.llm = LLMCaller()
+    def __init__(self, input_file: str = 'content.txt', output_file: str = 'output.txt', max_concurrent: int = 5,
+                 llm: Optional[LLMCaller] = None):
+        self.llm = llm or create_llm_caller()
         self.input_file = Path(input_file)
         self.output_file = Path(output_file)
         self.chunks: List[str] = []
@@ -43,9 +55,10 @@ Please process the above text according to the system instructions while maintai
         except UnicodeError:
             raise UnicodeError(f"Error reading {self.input_file}. Please ensure it's a valid text file.")
 
-    def split_into_chunks(self, sentences_per_chunk: int) -> List[str]:
-        content = self.read_content()
-        sentences = sent_tokenize(content)
+    def split_into_chunks(self, sentences_per_chunk: int, sentences: Optional[List[str]] = None) -> List[str]:
+        """Group sentences into prompt-wrapped chunks; pass sentences to skip tokenizing the input file"""
+        if sentences is None:
+            sentences = sent_tokenize(self.read_content())
         
         self.chunks = []
         current_chunk = []
@@ -83,11 +96,9 @@ Please process the above text according to the system instructions while maintai
             finally:
                 await asyncio.sleep(0.1)
 
-    async def process_chunks_async(self, model_name: str, custom_config: Optional[dict] = None) -> List[str]:
-        """Process chunks with controlled concurrency"""
-        if not self.chunks:
-            raise ValueError("No chunks to process. Run split_into_chunks first.")
-            
+    @staticmethod
+    def build_config(custom_config: Optional[dict] = None) -> Dict:
+        """Default generation settings for chunk processing, with optional overrides"""
         config = {
             'temperature': 0.7,
             'top_p': 0.95,
@@ -95,6 +106,14 @@ Please process the above text according to the system instructions while maintai
         }
         if custom_config:
             config.update(custom_config)
+        return config
+
+    async def process_chunks_async(self, model_name: str, custom_config: Optional[dict] = None) -> List[str]:
+        """Process chunks with controlled concurrency"""
+        if not self.chunks:
+            raise ValueError("No chunks to process. Run split_into_chunks first.")
+            
+        config = self.build_config(custom_config)
 
         tasks = []
         for i, chunk in enumerate(self.chunks):
@@ -104,6 +123,20 @@ Please process the above text according to the system instructions while maintai
         await asyncio.gather(*tasks)
         return [self.responses[i] for i in range(len(self.chunks))]
 
+    def process_chunks_batch(self, model_name: str, custom_config: Optional[dict] = None,
+                             service=None, poll_interval: float = 30.0) -> List[str]:
+        """Process all chunks as one provider batch job instead of concurrent chat calls"""
+        if not self.chunks:
+            raise ValueError("No chunks to process. Run split_into_chunks first.")
+
+        responses = self.llm.generate_batch(
+            model_name, self.chunks, self.build_config(custom_config),
+            service=service, poll_interval=poll_interval
+        )
+        self.responses = dict(enumerate(responses))
+        print(f"\nBatch finished: {self.llm.last_batch_stats}")
+        return responses
+
     def save_output(self) -> None:
         """Save processed content to output file"""
         if not self.responses:
@@ -114,11 +147,179 @@ Please process the above text according to the system instructions while maintai
         self.output_file.write_text(output_text, encoding='utf-8')
         print(f"\nOutput saved to {self.output_file}")
 
-async def main():
-    processor = ContentProcessor(max_concurrent=30)
-    
-    available_models = list(processor.llm.api_keys.keys())
-    
+class CorpusProcessor:
+    """Process every file in a directory or glob through one shared concurrency and rate budget"""
+    def __init__(self, source: str, output_dir: str = 'outputs', max_concurrent: int = 5,
+                 requests_per_minute: Optional[int] = None, segment_workers: int = 0,
+                 large_file_bytes: int = 1_000_000):
+        self.llm = create_llm_caller()
+        self.output_dir = Path(output_dir)
+        self.files = self.resolve_files(source, self.output_dir)
+        self.root = self.common_root(source, self.files)
+        self.max_concurrent = max_concurrent
+        self.use_rate_budget(requests_per_minute)
+        self.segment_workers = segment_workers
+        self.large_file_bytes = large_file_bytes
+        self.processors: List[ContentProcessor] = []
+
+    def use_rate_budget(self, requests_per_minute: Optional[int]) -> None:
+        """Charge every upstream request, retries included, to the same RateBudget the gateway uses"""
+        if not requests_per_minute:
+            return
+        if not isinstance(self.llm, LLMCaller):
+            print("Using the gateway's --rpm budget; start llm_gateway.py with --rpm to limit requests")
+            return
+        budget = RateBudget({name: requests_per_minute for name in self.llm.api_keys})
+        self.llm.request_hook = budget.acquire
+
+    @staticmethod
+    def resolve_files(source: str, output_dir: Optional[Path] = None) -> List[Path]:
+        """Input files for source, skipping anything under output_dir (earlier runs' outputs)"""
+        path = Path(source)
+        if path.is_dir():
+            files = sorted(p for p in path.iterdir() if p.is_file())
+        else:
+            files = sorted(Path(p) for p in glob.glob(source, recursive=True) if Path(p).is_file())
+        if output_dir is not None:
+            excluded = output_dir.resolve()
+            files = [f for f in files if not f.resolve().is_relative_to(excluded)]
+        if not files:
+            raise FileNotFoundError(f"No input files found for {source}")
+        return files
+
+    @staticmethod
+    def common_root(source: str, files: List[Path]) -> Path:
+        """Directory that outputs mirror, so files sharing a basename don't overwrite each other"""
+        if Path(source).is_dir():
+            return Path(source).resolve()
+        return Path(os.path.commonpath([str(f.resolve().parent) for f in files]))
+
+    def output_path(self, input_file: Path) -> Path:
+        return self.output_dir / input_file.resolve().relative_to(self.root)
+
+    @staticmethod
+    def save_processor_output(processor: ContentProcessor) -> None:
+        """Save one file's output; empty inputs get an empty output so every input has one"""
+        processor.output_file.parent.mkdir(parents=True, exist_ok=True)
+        if processor.chunks:
+            processor.save_output()
+        else:
+            processor.output_file.write_text('', encoding='utf-8')
+            print(f"\nOutput saved to {processor.output_file}")
+
+    def split_into_chunks(self, sentences_per_chunk: int) -> int:
+        """Chunk every file; large files are sentence-segmented in a process pool if enabled"""
+        presegmented: Dict[Path, List[str]] = {}
+        if self.segment_workers > 0:
+            large_files = [f for f in self.files if f.stat().st_size >= self.large_file_bytes]
+            if large_files:
+                with ProcessPoolExecutor(max_workers=self.segment_workers) as pool:
+                    presegmented = dict(zip(large_files, pool.map(segment_file, map(str, large_files))))
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.processors = []
+        for input_file in self.files:
+            processor = ContentProcessor(input_file, self.output_path(input_file), llm=self.llm)
+            processor.split_into_chunks(sentences_per_chunk, presegmented.get(input_file))
+            self.processors.append(processor)
+        return sum(len(p.chunks) for p in self.processors)
+
+    def interleave(self) -> List[Tuple[ContentProcessor, int]]:
+        """Round-robin chunks across files so no single file monopolizes the budget"""
+        schedule = []
+        longest = max((len(p.chunks) for p in self.processors), default=0)
+        for index in range(longest):
+            for processor in self.processors:
+                if index < len(processor.chunks):
+                    schedule.append((processor, index))
+        return schedule
+
+    async def process_corpus_async(self, model_name: str, custom_config: Optional[dict] = None) -> Dict[str, float]:
+        """Run all chunks through shared workers, saving each file as soon as its last chunk finishes"""
+        if not self.processors:
+            raise ValueError("No chunks to process. Run split_into_chunks first.")
+
+        config = ContentProcessor.build_config(custom_config)
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self.interleave():
+            queue.put_nowait(item)
+
+        total_chunks = queue.qsize()
+        remaining = {id(p): len(p.chunks) for p in self.processors}
+        completed = {'chunks': 0, 'files': 0}
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent)
+        start = time.perf_counter()
+
+        for processor in self.processors:
+            if not processor.chunks:
+                self.save_processor_output(processor)
+                completed['files'] += 1
+
+        async def worker():
+            while not queue.empty():
+                processor, index = queue.get_nowait()
+                try:
+                    response = await loop.run_in_executor(
+                        executor,
+                        self.llm.generate_response,
+                        model_name,
+                        processor.chunks[index],
+                        config
+                    )
+                except Exception as e:
+                    print(f"\nError processing {processor.input_file} chunk {index + 1}: {str(e)}")
+                    response = f"Error processing chunk: {str(e)}"
+                processor.responses[index] = response
+                completed['chunks'] += 1
+                remaining[id(processor)] -= 1
+                if remaining[id(processor)] == 0:
+                    self.save_processor_output(processor)
+                    completed['files'] += 1
+                print(f"\rProcessed chunk {completed['chunks']}/{total_chunks} "
+                      f"({completed['files']}/{len(self.processors)} files)", end="", flush=True)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.max_concurrent, total_chunks))))
+        finally:
+            executor.shutdown(wait=False)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'files': len(self.processors),
+            'chunks': total_chunks,
+            'elapsed_seconds': elapsed,
+            'chunks_per_second': total_chunks / elapsed if elapsed else 0.0,
+            'files_per_minute': len(self.processors) * 60 / elapsed if elapsed else 0.0,
+        }
+        print(f"\nCorpus done: {stats['files']} files, {stats['chunks']} chunks in {elapsed:.1f}s "
+              f"({stats['chunks_per_second']:.2f} chunks/s, {stats['files_per_minute']:.2f} files/min)")
+        return stats
+
+    def process_corpus_batch(self, model_name: str, custom_config: Optional[dict] = None,
+                             service=None, poll_interval: float = 30.0) -> Dict[str, float]:
+        """Submit every chunk of every file through the batch API, then write all outputs"""
+        if not self.processors:
+            raise ValueError("No chunks to process. Run split_into_chunks first.")
+
+        schedule = self.interleave()
+        start = time.perf_counter()
+        responses = self.llm.generate_batch(
+            model_name, [processor.chunks[index] for processor, index in schedule],
+            ContentProcessor.build_config(custom_config), service=service, poll_interval=poll_interval
+        )
+        for (processor, index), response in zip(schedule, responses):
+            processor.responses[index] = response
+        for processor in self.processors:
+            self.save_processor_output(processor)
+
+        elapsed = time.perf_counter() - start
+        stats = {'files': len(self.processors), 'chunks': len(schedule), 'elapsed_seconds': elapsed}
+        stats.update(self.llm.last_batch_stats)
+        print(f"\nCorpus batch done: {stats}")
+        return stats
+
+def select_model(available_models: List[str]) -> str:
     print("Available models:")
     for i, model in enumerate(available_models, 1):
         print(f"{i}. {model}")
@@ -127,30 +328,82 @@ async def main():
         try:
             model_choice = int(input("\nSelect model number: ")) - 1
             if 0 <= model_choice < len(available_models):
-                selected_model = available_models[model_choice]
-                break
+                return available_models[model_choice]
             print("Invalid choice. Please try again.")
         except ValueError:
             print("Please enter a number.")
-    
+
+def ask_sentences_per_chunk() -> int:
     while True:
         try:
             sentences = int(input("\nHow many sentences per chunk? "))
             if sentences > 0:
-                break
+                return sentences
             print("Please enter a positive number.")
         except ValueError:
             print("Please enter a valid number.")
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Process text through an LLM chunk by chunk")
+    parser.add_argument('--corpus', help="Directory or glob of input files to process under one scheduler")
+    parser.add_argument('--output-dir', default='outputs', help="Where corpus mode writes per-file outputs")
+    parser.add_argument('--max-concurrent', type=int, default=30)
+    parser.add_argument('--rpm', type=int, default=None, help="Corpus-wide requests per minute limit")
+    parser.add_argument('--segment-workers', type=int, default=0,
+                        help="Process pool size for sentence segmentation of large files (0 disables)")
+    parser.add_argument('--batch', action='store_true',
+                        help="Submit chunks as a provider batch job (GROQ, OpenAI, Anthropic)")
+    parser.add_argument('--batch-local', action='store_true',
+                        help="With --batch, use the in-process stand-in batch service instead of the provider")
+    parser.add_argument('--poll-interval', type=float, default=30.0, help="Seconds between batch status checks")
+    return parser.parse_args()
+
+def batch_service(args: argparse.Namespace):
+    return LocalBatchService() if args.batch_local else None
+
+async def run_corpus(args: argparse.Namespace):
+    corpus = CorpusProcessor(
+        args.corpus,
+        output_dir=args.output_dir,
+        max_concurrent=args.max_concurrent,
+        requests_per_minute=args.rpm,
+        segment_workers=args.segment_workers
+    )
+    selected_model = select_model(list(corpus.llm.api_keys.keys()))
+    sentences = ask_sentences_per_chunk()
+
+    try:
+        total = corpus.split_into_chunks(sentences)
+        print(f"\nSplit {len(corpus.files)} files into {total} chunks")
+        if args.batch:
+            corpus.process_corpus_batch(selected_model, service=batch_service(args), poll_interval=args.poll_interval)
+        else:
+            await corpus.process_corpus_async(selected_model)
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+async def main():
+    args = parse_args()
+    if args.corpus:
+        await run_corpus(args)
+        return
+
+    processor = ContentProcessor(max_concurrent=args.max_concurrent)
+    selected_model = select_model(list(processor.llm.api_keys.keys()))
+    sentences = ask_sentences_per_chunk()
+
     try:
         chunks = processor.split_into_chunks(sentences)
         print(f"\nSplit content into {len(chunks)} chunks")
         
-        await processor.process_chunks_async(selected_model)
+        if args.batch:
+            processor.process_chunks_batch(selected_model, service=batch_service(args), poll_interval=args.poll_interval)
+        else:
+            await processor.process_chunks_async(selected_model)
         processor.save_output()
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
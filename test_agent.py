@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+
+for module in ('dotenv', 'groq', 'openai', 'anthropic', 'google.generativeai'):
+    pytest.importorskip(module)
+
+from agent import Agent
+from file_cache import FileSnapshotCache
+
+class FakeLLM:
+    """Stands in for LLMCaller.generate_json, replaying responses and recording prompts"""
+    def __init__(self, responses):
+        self.responses = iter(responses)
+        self.prompts = []
+        self.last_json_error = None
+
+    def generate_json(self, api_name, user_input, schema, config=None):
+        self.prompts.append(user_input)
+        response = next(self.responses)
+        self.last_json_error = None if response is not None else "schema violation"
+        return response
+
+def test_think_records_seen_files_only_after_a_valid_response(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('LLM_GATEWAY_URL', raising=False)
+    (tmp_path / "a.py").write_text("x = 1\n")
+    agent = Agent("coder", ["a.py"], file_cache=FileSnapshotCache())
+    agent.llm_handler = FakeLLM([None, {"action": "analyze"}, {"action": "analyze"}])
+
+    assert asyncio.run(agent.think()) == {}
+    assert agent.seen_files == {}
+
+    assert asyncio.run(agent.think()) == {"action": "analyze"}
+    assert '"status": "full"' in agent.llm_handler.prompts[1]
+    assert set(agent.seen_files) == {"a.py"}
+
+    asyncio.run(agent.think())
+    assert '"status": "unchanged"' in agent.llm_handler.prompts[2]
+    agent.stop()
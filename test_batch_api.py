@@ -0,0 +1,153 @@
+import json
+
+from batch_api import (BatchRunner, LocalBatchService, build_batch_request,
+                       parse_openai_batch_output, split_jobs)
+
+class FakeLLM:
+    """Just the parts of LLMCaller that BatchRunner uses"""
+    default_configs = {
+        'GROQ': {'model': 'test-model', 'temperature': 0, 'max_tokens': 16},
+        'Anthropic': {'model': 'test-claude', 'temperature': 0, 'max_tokens': 16},
+    }
+
+    def _prepare_messages(self, user_input, config, chat_history=None):
+        messages = []
+        if config.get('system_prompt'):
+            messages.append({"role": "system", "content": config['system_prompt']})
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+class FlakyService(LocalBatchService):
+    """Drops or fails chosen custom_ids on the first job only"""
+    def __init__(self, missing=(), failing=()):
+        super().__init__()
+        self.missing = set(missing)
+        self.failing = set(failing)
+        self.submitted = []
+
+    def submit(self, requests):
+        self.submitted.append([r['custom_id'] for r in requests])
+        return super().submit(requests)
+
+    def results(self, batch_id):
+        results = super().results(batch_id)
+        if batch_id == 'local-batch-0':
+            for custom_id in self.missing:
+                results.pop(custom_id, None)
+            for custom_id in self.failing & set(results):
+                results[custom_id] = (False, 'rate limited')
+        return results
+
+def run(prompts, service, **kwargs):
+    runner = BatchRunner(FakeLLM(), service=service, poll_interval=0, **kwargs)
+    return runner, runner.run('GROQ', prompts)
+
+def test_results_map_back_to_prompt_order():
+    service = LocalBatchService()
+    original_results = service.results
+    # Provider output files are not ordered like the input
+    service.results = lambda batch_id: dict(reversed(list(original_results(batch_id).items())))
+
+    _, results = run(['a', 'b', 'c'], service)
+
+    assert results == ['a', 'b', 'c']
+
+def test_failed_and_missing_entries_are_resubmitted():
+    service = FlakyService(missing=['chunk-1'], failing=['chunk-2'])
+
+    runner, results = run(['a', 'b', 'c'], service)
+
+    assert results == ['a', 'b', 'c']
+    assert service.submitted == [['chunk-0', 'chunk-1', 'chunk-2'], ['chunk-1', 'chunk-2']]
+    assert runner.stats == {'submitted': 5, 'succeeded': 3, 'resubmitted': 2, 'failed': 0}
+
+def test_entries_failing_every_attempt_get_an_error_value():
+    def responder(request):
+        if request['body']['messages'][-1]['content'] == 'bad':
+            raise RuntimeError('invalid request')
+        return 'ok'
+
+    runner, results = run(['good', 'bad'], LocalBatchService(responder=responder), max_attempts=2)
+
+    assert results == ['ok', 'Error processing chunk: invalid request']
+    assert runner.stats == {'submitted': 3, 'succeeded': 1, 'resubmitted': 1, 'failed': 1}
+
+def test_stats_with_seeded_failure_rate():
+    prompts = [f"prompt {i}" for i in range(50)]
+
+    runner, results = run(prompts, LocalBatchService(failure_rate=0.3, seed=7), max_attempts=5)
+    stats = runner.stats
+
+    assert stats['resubmitted'] > 0
+    assert stats['submitted'] == len(prompts) + stats['resubmitted']
+    assert stats['succeeded'] + stats['failed'] == len(prompts)
+    assert sum(not r.startswith('Error processing chunk') for r in results) == stats['succeeded']
+    # Same seed, same outcome
+    assert run(prompts, LocalBatchService(failure_rate=0.3, seed=7), max_attempts=5)[0].stats == stats
+
+def test_requests_are_split_into_several_jobs():
+    service = FlakyService()
+
+    runner, results = run([f"p{i}" for i in range(5)], service, max_requests_per_job=2)
+
+    assert results == [f"p{i}" for i in range(5)]
+    assert service.submitted == [['chunk-0', 'chunk-1'], ['chunk-2', 'chunk-3'], ['chunk-4']]
+    assert runner.stats['submitted'] == 5
+
+def test_split_jobs_respects_byte_limit():
+    requests = [{'custom_id': str(i), 'body': 'x' * 100} for i in range(4)]
+    line = len(json.dumps(requests[0])) + 1
+
+    jobs = split_jobs(requests, max_requests=10, max_bytes=2 * line)
+
+    assert [len(job) for job in jobs] == [2, 2]
+
+def test_oversized_request_fails_without_being_submitted():
+    service = FlakyService()
+
+    runner, results = run(['small', 'x' * 1000], service, max_bytes_per_job=500)
+
+    assert results[0] == 'small'
+    assert results[1].startswith('Error processing chunk: request exceeds')
+    assert service.submitted == [['chunk-0']]
+    assert runner.stats['failed'] == 1
+
+def test_build_batch_request_openai_style():
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]
+
+    request = build_batch_request('OpenAI', 'chunk-0', messages, {'model': 'gpt', 'temperature': 0, 'seed': 1})
+
+    assert request == {
+        'custom_id': 'chunk-0',
+        'method': 'POST',
+        'url': '/v1/chat/completions',
+        'body': {'model': 'gpt', 'messages': messages, 'temperature': 0, 'seed': 1},
+    }
+    assert 'seed' not in build_batch_request('GROQ', 'chunk-0', messages, {'model': 'llama', 'seed': 1})['body']
+
+def test_build_batch_request_anthropic():
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]
+
+    request = build_batch_request('Anthropic', 'chunk-0', messages,
+                                  {'model': 'claude', 'max_tokens': 16, 'system_prompt': 'be brief'})
+
+    assert request == {
+        'custom_id': 'chunk-0',
+        'params': {'model': 'claude', 'max_tokens': 16, 'system': 'be brief',
+                   'messages': [{"role": "user", "content": "hi"}]},
+    }
+
+def test_parse_openai_batch_output_reports_error_status():
+    output = '\n'.join(json.dumps(entry) for entry in [
+        {'custom_id': 'chunk-0', 'response': {'status_code': 200, 'body': {
+            'choices': [{'message': {'content': 'done'}}]}}},
+        {'custom_id': 'chunk-1', 'response': {'status_code': 429, 'body': {
+            'error': {'message': 'rate limited'}}}},
+        {'custom_id': 'chunk-2', 'response': None, 'error': {'code': 'expired'}},
+    ])
+
+    results = parse_openai_batch_output(output + '\n')
+
+    assert results['chunk-0'] == (True, 'done')
+    assert results['chunk-1'][0] is False and 'rate limited' in results['chunk-1'][1]
+    assert results['chunk-2'] == (False, str({'code': 'expired'}))
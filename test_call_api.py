@@ -0,0 +1,143 @@
+import time
+import asyncio
+import threading
+import pytest
+
+for module in ('dotenv', 'groq', 'openai', 'anthropic', 'google.generativeai'):
+    pytest.importorskip(module)
+
+from call_api import LLMCaller
+
+DUPLICATES = 5
+
+def make_caller():
+    """LLMCaller whose GROQ handler is a slow fake that counts upstream calls"""
+    llm = LLMCaller()
+    llm.api_keys['GROQ'] = 'test'
+    calls = []
+
+    def fake_groq(user_input, config, chat_history=None):
+        calls.append(user_input)
+        time.sleep(0.2)
+        return f"response to {user_input}"
+
+    llm._handle_groq = fake_groq
+    return llm, calls
+
+def test_concurrent_duplicates_from_threads_share_one_call():
+    llm, calls = make_caller()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(llm.generate_response('GROQ', 'same prompt')))
+        for _ in range(DUPLICATES)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["response to same prompt"] * DUPLICATES
+    assert len(calls) == 1
+    assert llm.coalesced_requests == DUPLICATES - 1
+
+def test_concurrent_duplicates_from_tasks_share_one_call():
+    llm, calls = make_caller()
+
+    async def submit_all():
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(
+            loop.run_in_executor(None, llm.generate_response, 'GROQ', 'same prompt')
+            for _ in range(DUPLICATES)
+        ))
+
+    results = asyncio.run(submit_all())
+
+    assert results == ["response to same prompt"] * DUPLICATES
+    assert len(calls) == 1
+    assert llm.coalesced_requests == DUPLICATES - 1
+
+def test_non_deterministic_requests_are_not_coalesced():
+    llm, calls = make_caller()
+    threads = [
+        threading.Thread(target=llm.generate_response, args=('GROQ', 'same prompt', {'temperature': 0.7}))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 3
+    assert llm.coalesced_requests == 0
+
+SCHEMA = {
+    "type": "object",
+    "required": ["action"],
+    "properties": {"action": {"type": "string", "enum": ["analyze", "send_message"]}}
+}
+
+def make_streaming_caller(replies):
+    """LLMCaller whose GROQ stream replays replies in order, recording the prompt of each attempt"""
+    llm = LLMCaller()
+    llm.api_keys['GROQ'] = 'test'
+    prompts = []
+    replies = iter(replies)
+
+    def fake_stream(user_input, config, chat_history=None):
+        prompts.append(user_input)
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        yield from reply
+
+    llm._stream_groq = fake_stream
+    return llm, prompts
+
+def test_generate_json_repairs_after_schema_violation():
+    llm, prompts = make_streaming_caller([
+        ['{"action": "del', 'ete"}'],
+        ['{"action": ', '"analyze"}'],
+    ])
+
+    assert llm.generate_json('GROQ', 'plan', SCHEMA) == {"action": "analyze"}
+    assert prompts[0] == 'plan'
+    assert prompts[1].startswith('plan') and 'rejected' in prompts[1]
+    assert llm.last_json_error is None
+
+def test_generate_json_retries_transport_errors_with_original_prompt():
+    llm, prompts = make_streaming_caller([
+        ConnectionError("connection reset"),
+        ['{"action": "analyze"}'],
+    ])
+
+    assert llm.generate_json('GROQ', 'plan', SCHEMA) == {"action": "analyze"}
+    assert prompts == ['plan', 'plan']
+
+def test_generate_json_does_not_retry_configuration_errors():
+    llm, _ = make_streaming_caller([])
+    llm.api_keys['OpenAI'] = None
+
+    assert llm.generate_json('OpenAI', 'plan', SCHEMA) is None
+    assert llm.json_metrics()['retries'] == 0
+    assert 'No API key' in llm.last_json_error
+
+def test_generate_json_stops_reading_after_complete_document():
+    llm, _ = make_streaming_caller([['{"action": "analyze"}', ' Hope this helps!', 'never read']])
+
+    assert llm.generate_json('GROQ', 'plan', SCHEMA) == {"action": "analyze"}
+    assert llm.json_metrics()['wasted_chars'] == 0
+
+def test_json_metrics_counts_aborts_retries_and_waste():
+    first = '{"action": "del'
+    llm, _ = make_streaming_caller([[first], [first], [first]])
+
+    assert llm.generate_json('GROQ', 'plan', SCHEMA, max_attempts=3) is None
+    metrics = llm.json_metrics()
+    assert metrics['requests'] == 1
+    assert metrics['aborted'] == 3
+    assert metrics['retries'] == 2
+    assert metrics['failed'] == 1
+    assert metrics['valid'] == 0
+    assert metrics['wasted_chars'] == 3 * len(first)
+    assert metrics['wasted_tokens_estimate'] == 3 * len(first) / 4
+    assert metrics['mean_time_to_valid'] == 0.0
@@ -0,0 +1,81 @@
+import os
+import threading
+
+from file_cache import FileSnapshotCache
+
+def write_file(path, content, mtime_ns=None):
+    path.write_text(content)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_unchanged_mtime_and_size_is_a_hit(tmp_path):
+    path = tmp_path / "a.py"
+    write_file(path, "x = 1\n", mtime_ns=1_000_000_000)
+    cache = FileSnapshotCache()
+
+    first = cache.get(path)
+    second = cache.get(path)
+
+    assert second is first
+    assert cache.stats == {'reads': 1, 'hits': 1, 'changes': 0}
+
+def test_new_mtime_with_same_hash_is_not_a_change(tmp_path):
+    path = tmp_path / "a.py"
+    write_file(path, "x = 1\n", mtime_ns=1_000_000_000)
+    cache = FileSnapshotCache()
+    notified = []
+    cache.subscribe(lambda changed, snapshot: notified.append(changed))
+
+    first = cache.get(path)
+    write_file(path, "x = 1\n", mtime_ns=2_000_000_000)
+    second = cache.get(path)
+
+    assert second.version == first.version
+    assert second.mtime_ns == 2_000_000_000
+    assert cache.stats == {'reads': 2, 'hits': 0, 'changes': 0}
+    assert notified == []
+
+def test_context_for_sends_full_then_diff_then_unchanged_then_missing(tmp_path):
+    path = str(tmp_path / "a.py")
+    lines = [f"line {i}\n" for i in range(50)]
+    write_file(tmp_path / "a.py", ''.join(lines), mtime_ns=1_000_000_000)
+    cache = FileSnapshotCache()
+    seen = {}
+
+    assert cache.context_for([path], seen)[path] == {'status': 'full', 'content': ''.join(lines)}
+
+    lines[10] = "line ten\n"
+    write_file(tmp_path / "a.py", ''.join(lines), mtime_ns=2_000_000_000)
+    context = cache.context_for([path], seen)[path]
+    assert context['status'] == 'diff'
+    assert "-line 10\n+line ten\n" in context['diff']
+
+    assert cache.context_for([path], seen)[path] == {'status': 'unchanged'}
+
+    os.remove(path)
+    assert cache.context_for([path], seen)[path] == {'status': 'missing'}
+    assert path not in seen
+
+def test_subscribers_are_called_without_the_lock_held(tmp_path):
+    path = tmp_path / "a.py"
+    write_file(path, "x = 1\n")
+    cache = FileSnapshotCache()
+    cache.get(path)
+    lock_free = []
+
+    def try_lock():
+        acquired = cache.lock.acquire(timeout=1)
+        lock_free.append(acquired)
+        if acquired:
+            cache.lock.release()
+
+    def subscriber(changed, snapshot):
+        # Another thread must be able to take the lock while a subscriber runs
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+
+    cache.subscribe(subscriber)
+    cache.write(path, "x = 2\n")
+
+    assert lock_free == [True]
@@ -0,0 +1,106 @@
+import json
+import pytest
+
+from json_stream import StreamingJSONValidator, SchemaViolation
+
+ACTION_SCHEMA = {
+    "type": "object",
+    "required": ["action"],
+    "properties": {
+        "action": {"type": "string", "enum": ["file_change", "send_message", "analyze"]},
+        "changes": {
+            "type": "object",
+            "properties": {
+                "replace_all": {"type": "boolean"},
+                "patches": {
+                    "type": "array",
+                    "items": {"type": "object", "properties": {"start": {"type": "integer"}}}
+                }
+            }
+        }
+    }
+}
+
+TREE_SCHEMA = {
+    "type": "object",
+    "required": ["name", "type"],
+    "properties": {
+        "name": {"type": "string"},
+        "type": {"type": "string", "enum": ["directory", "file"]},
+        "children": {"type": "array", "items": {"$ref": "#"}}
+    }
+}
+
+def validate(text, schema=ACTION_SCHEMA, chunk_size=1):
+    """Feed text in small chunks like a stream and return the parsed document"""
+    validator = StreamingJSONValidator(schema)
+    for i in range(0, len(text), chunk_size):
+        validator.feed(text[i:i + chunk_size])
+    validator.finish()
+    return json.loads(validator.json_text)
+
+def aborted_after(text, schema=ACTION_SCHEMA):
+    """Number of characters fed before the validator gave up"""
+    validator = StreamingJSONValidator(schema)
+    for count, char in enumerate(text, 1):
+        try:
+            validator.feed(char)
+        except SchemaViolation:
+            return count
+    pytest.fail("validator accepted invalid input")
+
+def test_valid_document_round_trips():
+    text = '{"action": "analyze", "changes": {"replace_all": true, "patches": [{"start": 3}]}}'
+    assert validate(text, chunk_size=7) == json.loads(text)
+
+def test_enum_prefix_aborts_before_string_ends():
+    text = '{"action": "delete_everything"}'
+    assert aborted_after(text) == text.index('"delete') + 2
+
+def test_wrong_type_aborts_at_value_start():
+    text = '{"action": "analyze", "changes": {"replace_all": "yes"}}'
+    assert aborted_after(text) == text.index('"yes') + 1
+
+def test_float_where_integer_expected_is_rejected():
+    with pytest.raises(SchemaViolation, match="expected integer"):
+        validate('{"action": "analyze", "changes": {"patches": [{"start": 1.5}]}}')
+
+def test_missing_required_key_is_rejected_when_object_closes():
+    with pytest.raises(SchemaViolation, match="missing required keys \\['action'\\]"):
+        validate('{"changes": {}}')
+
+def test_unicode_escapes_are_accepted():
+    text = '{"name": "caf\\u00e9", "type": "fil\\u0065"}'
+    assert validate(text, TREE_SCHEMA) == {"name": "café", "type": "file"}
+
+def test_invalid_unicode_escape_is_rejected():
+    with pytest.raises(SchemaViolation, match="invalid \\\\u escape"):
+        validate('{"name": "\\u00zz", "type": "file"}', TREE_SCHEMA)
+
+def test_recursive_schema_checks_nested_nodes():
+    with pytest.raises(SchemaViolation, match="is not one of"):
+        validate('{"name": "a", "type": "directory", "children": [{"name": "b", "type": "dir"}]}', TREE_SCHEMA)
+
+def test_prose_and_code_fence_around_document_are_ignored():
+    text = 'Here is the project:\n```json\n{"name": "a", "type": "file"}\n```\nLet me know if you need more!'
+    assert validate(text, TREE_SCHEMA) == {"name": "a", "type": "file"}
+
+def test_brackets_in_leading_prose_do_not_start_an_object_document():
+    assert validate('Sure [see below] {"name": "a", "type": "file"}', TREE_SCHEMA) == {"name": "a", "type": "file"}
+
+def test_complete_is_set_as_soon_as_document_closes():
+    validator = StreamingJSONValidator(TREE_SCHEMA)
+    validator.feed('{"name": "a", "type": "file"}')
+    assert validator.complete
+
+def test_reply_without_document_fails_on_finish():
+    validator = StreamingJSONValidator(TREE_SCHEMA)
+    validator.feed("I cannot help with that.")
+    with pytest.raises(SchemaViolation, match="ended before"):
+        validator.finish()
+
+def test_truncated_document_fails_on_finish():
+    validator = StreamingJSONValidator(TREE_SCHEMA)
+    validator.feed('{"name": "a", "type": "fi')
+    with pytest.raises(SchemaViolation):
+        validator.finish()
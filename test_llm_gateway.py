@@ -0,0 +1,59 @@
+import time
+import threading
+import pytest
+
+for module in ('dotenv', 'groq', 'openai', 'anthropic', 'google.generativeai'):
+    pytest.importorskip(module)
+
+from call_api import LLMCaller
+from llm_gateway import LLMGateway, GatewayClient, serve
+
+@pytest.fixture
+def gateway_url():
+    """Gateway whose GROQ stream is valid JSON for 'fast' and invalid (after a delay) for 'slow'"""
+    llm = LLMCaller()
+    llm.api_keys['GROQ'] = 'test'
+
+    def fake_stream(user_input, config, chat_history=None):
+        if user_input == 'slow':
+            time.sleep(0.2)
+            yield 'not json'
+        else:
+            yield '{"a": 1}'
+
+    llm._stream_groq = fake_stream
+    llm._handle_groq = lambda user_input, config, chat_history=None: f"response to {user_input}"
+    server = serve(LLMGateway(llm), port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_client_round_trip(gateway_url):
+    client = GatewayClient(gateway_url)
+    assert client.api_keys['GROQ'] is True
+    assert client.generate_response('GROQ', 'hi') == "response to hi"
+
+def test_unreachable_gateway_returns_error_text_instead_of_raising():
+    client = GatewayClient("http://127.0.0.1:1")
+    assert client.api_keys == {}
+    assert client.generate_response('GROQ', 'hi').startswith("An error occurred with GROQ")
+    assert client.generate_json('GROQ', 'hi', {"type": "object"}) is None
+    assert "gateway unavailable" in client.last_json_error
+
+def test_concurrent_json_errors_are_reported_per_call(gateway_url):
+    results = {}
+
+    def run(prompt):
+        client = GatewayClient(gateway_url)
+        results[prompt] = client.generate_json_with_error('GROQ', prompt, {"type": "object"}, max_attempts=1)
+
+    threads = [threading.Thread(target=run, args=(prompt,)) for prompt in ('slow', 'fast')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results['fast'] == ({"a": 1}, None)
+    assert results['slow'][0] is None
+    assert "ended before" in results['slow'][1]
@@ -0,0 +1,61 @@
+import time
+import threading
+import pytest
+
+for module in ('dotenv', 'groq', 'openai', 'anthropic', 'google.generativeai', 'nltk', 'aiohttp'):
+    pytest.importorskip(module)
+
+from llm_gateway import RateBudget
+from personal.process_content import ContentProcessor, CorpusProcessor
+
+def make_corpus(tmp_path, monkeypatch, source, **kwargs):
+    monkeypatch.delenv('LLM_GATEWAY_URL', raising=False)
+    return CorpusProcessor(source, output_dir=str(tmp_path / "outputs"), **kwargs)
+
+def test_interleave_round_robins_across_files(tmp_path, monkeypatch):
+    for name in ("a.txt", "b.txt", "c.txt"):
+        (tmp_path / name).write_text("text")
+    corpus = make_corpus(tmp_path, monkeypatch, str(tmp_path))
+    corpus.processors = [ContentProcessor(f, corpus.output_path(f), llm=corpus.llm) for f in corpus.files]
+    for processor, count in zip(corpus.processors, (3, 1, 2)):
+        processor.chunks = [f"chunk {i}" for i in range(count)]
+
+    schedule = [(processor.input_file.name, index) for processor, index in corpus.interleave()]
+
+    assert schedule == [("a.txt", 0), ("b.txt", 0), ("c.txt", 0), ("a.txt", 1), ("c.txt", 1), ("a.txt", 2)]
+
+def test_output_paths_mirror_inputs_with_duplicate_basenames(tmp_path, monkeypatch):
+    for folder in ("one", "two"):
+        (tmp_path / "corpus" / folder).mkdir(parents=True)
+        (tmp_path / "corpus" / folder / "notes.txt").write_text("text")
+    corpus = make_corpus(tmp_path, monkeypatch, str(tmp_path / "corpus" / "**" / "*.txt"))
+
+    outputs = [corpus.output_path(f) for f in corpus.files]
+
+    assert outputs == [tmp_path / "outputs" / "one" / "notes.txt", tmp_path / "outputs" / "two" / "notes.txt"]
+
+def test_output_dir_is_excluded_from_inputs(tmp_path, monkeypatch):
+    (tmp_path / "input.txt").write_text("text")
+    (tmp_path / "outputs").mkdir()
+    (tmp_path / "outputs" / "input.txt").write_text("earlier output")
+    corpus = make_corpus(tmp_path, monkeypatch, str(tmp_path / "**" / "*.txt"))
+
+    assert corpus.files == [tmp_path / "input.txt"]
+
+def test_rpm_spaces_upstream_requests_through_a_rate_budget(tmp_path, monkeypatch):
+    (tmp_path / "input.txt").write_text("text")
+    corpus = make_corpus(tmp_path, monkeypatch, str(tmp_path), requests_per_minute=600)
+    started = []
+    corpus.llm.api_keys['GROQ'] = 'test'
+    corpus.llm._handle_groq = lambda user_input, config, chat_history=None: started.append(time.monotonic())
+
+    threads = [threading.Thread(target=corpus.llm.generate_response, args=('GROQ', f"chunk {i}"))
+               for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert isinstance(corpus.llm.request_hook.__self__, RateBudget)
+    gaps = [later - earlier for earlier, later in zip(sorted(started), sorted(started)[1:])]
+    assert len(gaps) == 2 and min(gaps) >= 0.09